@@ -15,7 +15,7 @@
 # You should have received a copy of the GNU General Public License along with
 # SkoolKit. If not, see <http://www.gnu.org/licenses/>.
 
-import re
+import struct
 
 from skoolkit import get_word
 
@@ -128,6 +128,23 @@ def get_char(code, u_fmt='{{0x{:02X}}}', udg_fmt='{{UDG-{}}}', tokens=False):
         return TOKENS[code]
     return u_fmt.format(code)
 
+NUM_CHARS = frozenset('0123456789.')
+
+def _get_token_forms(code):
+    token = TOKENS[code]
+    if code < 168 or code == 203 or token[-1] in '#=>':
+        # RND, INKEY$, PI, THEN, '<=', '>=', '<>', 'OPEN #', 'CLOSE #'
+        plain, lspace = token, True
+    else:
+        plain, lspace = token + ' ', False
+    if code >= 197 and token[0] >= 'A':
+        return plain, ' ' + plain, lspace
+    return plain, plain, lspace
+
+CHARS = [get_char(c) for c in range(165)]
+
+TOKEN_FORMS = {c: _get_token_forms(c) for c in TOKENS}
+
 def _get_number(snapshot, i):
     if snapshot[i]:
         return _get_float(snapshot, i)
@@ -147,6 +164,22 @@ def _get_float(snapshot, i):
                      + snapshot[i + 4])
     return sign * mantissa * (2 ** exponent)
 
+def _get_numbers(snapshot, start, end):
+    size = 5 * len(range(start, end, 5))
+    data = bytes(snapshot[start:start + size])
+    if len(data) < size:
+        return [_get_number(snapshot, i) for i in range(start, end, 5)]
+    numbers = []
+    for exponent, mantissa in struct.iter_unpack('>BI', data):
+        if exponent:
+            sign = -1 if mantissa & 0x80000000 else 1
+            numbers.append(sign * float(mantissa | 0x80000000) * (2 ** (exponent - 160)))
+        elif mantissa & 0xFF000000:
+            numbers.append((mantissa >> 16 & 255) + (mantissa & 0xFF00) - 65536)
+        else:
+            numbers.append((mantissa >> 16 & 255) + (mantissa & 0xFF00))
+    return numbers
+
 def _unflatten(values, dimensions):
     for d in reversed(dimensions[1:]):
         values = [values[i:i + d] for i in range(0, len(values), d)]
@@ -157,62 +190,57 @@ class TextReader:
         self.lspace = False
 
     def get_chars(self, code):
-        if code <= 32:
-            self.lspace = False
-            return get_char(code)
-        if code <= 164:
-            self.lspace = True
-            return get_char(code)
-        return self._get_token(code)
-
-    def _get_token(self, code):
-        token = TOKENS[code]
-        if self.lspace and code >= 197 and token[0] >= 'A':
-            token = ' ' + token
-        self.lspace = True
-        if code < 168 or code == 203 or token[-1] in '#=>':
-            # RND, INKEY$, PI, THEN, '<=', '>=', '<>', 'OPEN #', 'CLOSE #'
-            return token
-        self.lspace = False
-        return token + ' '
+        if code < 165:
+            self.lspace = code > 32
+            return CHARS[code]
+        plain, spaced, lspace = TOKEN_FORMS[code]
+        if self.lspace:
+            plain = spaced
+        self.lspace = lspace
+        return plain
 
 class BasicLister:
     def __init__(self):
         self.text = TextReader()
 
     def list_basic(self, snapshot):
-        lines = []
+        return '\n'.join(self.get_lines(snapshot))
+
+    def get_lines(self, snapshot):
         self.snapshot = snapshot
         i = (snapshot[23635] + 256 * snapshot[23636]) or 23755
         while i < len(snapshot) and snapshot[i] < 64:
             line_no = snapshot[i] * 256 + snapshot[i + 1]
             self.text.lspace = False
             i, line = self._get_basic_line(i + 4)
-            lines.append('{:>4} {}'.format(line_no, line))
-        return '\n'.join(lines)
+            yield '{:>4} {}'.format(line_no, line)
 
     def _get_basic_line(self, i):
-        line = ''
-        while i < len(self.snapshot) and self.snapshot[i] != 13:
-            code = self.snapshot[i]
+        snapshot = self.snapshot
+        end = len(snapshot)
+        get_chars = self.text.get_chars
+        line = []
+        while i < end:
+            code = snapshot[i]
+            if code == 13:
+                break
             if code == 14:
-                if i + 5 < len(self.snapshot):
-                    line += self._get_fp_num(i)
+                if i + 5 < end:
+                    line.append(self._get_fp_num(i))
                     i += 6
                 else:
-                    while i < len(self.snapshot):
-                        line += '{{0x{:02X}}}'.format(self.snapshot[i])
-                        i += 1
-            elif 16 <= code <= 21 and i + 1 < len(self.snapshot):
-                line += '{{0x{:02X}{:02X}}}'.format(code, self.snapshot[i + 1])
+                    line.extend(['{{0x{:02X}}}'.format(b) for b in snapshot[i:end]])
+                    i = end
+            elif 16 <= code <= 21 and i + 1 < end:
+                line.append('{{0x{:02X}{:02X}}}'.format(code, snapshot[i + 1]))
                 i += 2
-            elif 22 <= code <= 23 and i + 2 < len(self.snapshot):
-                line += '{{0x{:02X}{:02X}{:02X}}}'.format(code, self.snapshot[i + 1], self.snapshot[i + 2])
+            elif 22 <= code <= 23 and i + 2 < end:
+                line.append('{{0x{:02X}{:02X}{:02X}}}'.format(code, snapshot[i + 1], snapshot[i + 2]))
                 i += 3
             else:
-                line += self.text.get_chars(code)
+                line.append(get_chars(code))
                 i += 1
-        return i + 1, line
+        return i + 1, ''.join(line)
 
     def _get_fp_num(self, i):
         num_str = self._get_num_str(i - 1)
@@ -228,31 +256,34 @@ class BasicLister:
         return ''
 
     def _get_num_str(self, j):
-        while self.snapshot[j] < 33:
+        snapshot = self.snapshot
+        while snapshot[j] < 33:
             j -= 1
-        num_str = chr(self.snapshot[j])
-        while re.match('[0-9.]+([eE][-+]?[0-9]+)?', num_str):
+        chars = [chr(snapshot[j])]
+        while chars[-1] in NUM_CHARS:
             j -= 1
-            this_chr = chr(self.snapshot[j])
+            this_chr = chr(snapshot[j])
             signed = this_chr in '+-'
             if signed:
-                num_str = this_chr + num_str
+                chars.append(this_chr)
                 j -= 1
-                this_chr = chr(self.snapshot[j])
+                this_chr = chr(snapshot[j])
             if this_chr in 'eE':
-                num_str = this_chr + num_str
+                chars.append(this_chr)
                 j -= 1
             elif signed:
                 break
-            num_str = chr(self.snapshot[j]) + num_str
-        return num_str[1:]
+            chars.append(chr(snapshot[j]))
+        return ''.join(reversed(chars[:-1]))
 
 class VariableLister:
     def __init__(self):
         self.text = TextReader()
 
     def list_variables(self, snapshot):
-        lines = []
+        return '\n'.join(self.get_lines(snapshot))
+
+    def get_lines(self, snapshot):
         self.snapshot = snapshot
         i = snapshot[23627] + 256 * snapshot[23628]
         while i < len(snapshot) and snapshot[i] != 128:
@@ -281,8 +312,7 @@ class VariableLister:
                 # Basic line (00xxxxxx)
                 i += get_word(snapshot, i + 2) + 4
                 continue
-            lines.append(line)
-        return '\n'.join(lines)
+            yield line
 
     def _get_string_var(self, name, i):
         end = i + 3 + get_word(self.snapshot, i + 1)
@@ -295,7 +325,7 @@ class VariableLister:
         v_end = i + 3 + get_word(self.snapshot, i + 1)
         dims = [get_word(self.snapshot, c) for c in range(i + 4, v_start, 2)]
         dims_str = ','.join([str(d) for d in dims])
-        values = _unflatten([_get_number(self.snapshot, c) for c in range(v_start, v_end, 5)], dims)
+        values = _unflatten(_get_numbers(self.snapshot, v_start, v_end), dims)
         line = '{}({})={}'.format(name, dims_str, values)
         return v_end, line
 
@@ -313,7 +343,9 @@ class VariableLister:
         dims = [get_word(self.snapshot, c) for c in range(i + 4, v_start, 2)]
         dims_str = ','.join([str(d) for d in dims])
         str_len = dims[-1]
-        strings = [''.join([self.text.get_chars(self.snapshot[k]) for k in range(j, j + str_len)]) for j in range(v_start, v_end, str_len)]
+        get_chars = self.text.get_chars
+        chars = [get_chars(self.snapshot[k]) for k in range(v_start, v_start + str_len * len(range(v_start, v_end, str_len)))]
+        strings = [''.join(chars[j:j + str_len]) for j in range(0, len(chars), str_len)]
         if len(dims) > 1:
             values = _unflatten(strings, dims[:-1])
         else:
@@ -18,12 +18,13 @@ import os
 import argparse
 
 from skoolkit import integer, read_bin_file, VERSION
-from skoolkit.snapshot import poke, print_reg_help, print_state_help, write_z80v3
+from skoolkit.snapshot import ByteMemory, poke, print_reg_help, print_state_help, write_z80v3
 
 def run(infile, outfile, options):
-    ram = list(read_bin_file(infile, 49152))
+    ram = read_bin_file(infile, 49152)
     org = options.org or 65536 - len(ram)
-    snapshot = [0] * org + ram + [0] * (65536 - org - len(ram))
+    snapshot = ByteMemory(65536)
+    snapshot[org:org + len(ram)] = ram
     if options.start is None:
         start = org
     else:
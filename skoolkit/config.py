@@ -30,6 +30,7 @@ COMMANDS = {
         'InstructionUtility': 'skoolkit.skoolparser.InstructionUtility',
         'OperandEvaluator': 'skoolkit.z80',
         'OperandFormatter': 'skoolkit.disassembler.OperandFormatter',
+        'SkoolFileCache': '',
         'SnapshotReader': 'skoolkit.snapshot',
         'SnapshotReferenceCalculator': 'skoolkit.snaskool',
         'SnapshotReferenceOperations': 'DJ,JR,JP,CA,RS'
@@ -84,6 +85,8 @@ COMMANDS = {
         'Base': (0, 'base'),
         'Case': (0, 'case'),
         'CreateLabels': (0, 'create_labels'),
+        'Incremental': (0, 'incremental'),
+        'Jobs': (1, 'jobs'),
         'JoinCss': ('', 'single_css'),
         'OutputDir': ('.', 'output_dir'),
         'Quiet': (0, 'quiet'),
@@ -65,6 +65,7 @@ StyleSheet=skoolkit.css
 """
 
 SECTIONS['ImageWriter'] = """
+; PNGAdaptiveCompression=0
 ; PNGAlpha=255
 ; PNGCompressionLevel=9
 ; PNGEnableAnimation=1
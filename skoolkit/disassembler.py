@@ -17,6 +17,19 @@
 from skoolkit.components import get_component
 from skoolkit.ctlparser import DEFAULT_BASE
 
+# Operation types in the decode tables
+NO_OP, BYTE_OP, WORD_OP, JR_OP, INDEX_OP, PREFIX, OTHER = range(7)
+
+class _OperationCache(dict):
+    def __init__(self, template, formatter, base):
+        self.template = template
+        self.formatter = formatter
+        self.base = base
+
+    def __missing__(self, value):
+        operation = self[value] = self.template.format(self.formatter(value, self.base))
+        return operation
+
 class OperandFormatter:
     """Initialise the operand formatter.
 
@@ -129,6 +142,7 @@ class Disassembler:
             self.after_DD = {k: (v[0], v[1].lower()) for k, v in self.after_DD.items()}
             self.after_ED = {k: (v[0], v[1].lower()) for k, v in self.after_ED.items()}
             self.after_DDCB = {k: (v[0], v[1].lower()) for k, v in self.after_DDCB.items()}
+        self._decode_tables = {}
 
     def disassemble(self, start, end, base):
         """Disassemble an address range.
@@ -141,21 +155,82 @@ class Disassembler:
                      one for each operand (e.g. 'dh').
         :return: A list of tuples of the form ``(address, operation, bytes)``.
         """
+        table = self._decode_tables.get(base)
+        if table is None:
+            table = self._decode_tables[base] = self._build_decode_table(base)
+        snapshot = self.snapshot
         instructions = []
         address = start
         while address < end:
-            decoder, template = self.ops[self.snapshot[address]]
-            if template == '':
-                operation, length = decoder(self, address, base)
+            length, operations, op_type = table[snapshot[address]]
+            if op_type == PREFIX:
+                length, operations, op_type = operations[snapshot[(address + 1) & 65535]]
+            if op_type == NO_OP:
+                operation = operations
+            elif op_type == BYTE_OP or op_type == INDEX_OP:
+                operation = operations[snapshot[(address + length - 1) & 65535]]
+            elif op_type == WORD_OP:
+                operation = operations[snapshot[(address + length - 2) & 65535] + 256 * snapshot[(address + length - 1) & 65535]]
+            elif op_type == JR_OP:
+                offset = snapshot[(address + 1) & 65535]
+                if offset < 128:
+                    target = address + 2 + offset
+                else:
+                    target = address + offset - 254
+                if 0 <= target < 65536:
+                    operation = operations[target]
+                else:
+                    operation = self._defb(address, 2)[0]
             else:
-                operation, length = decoder(self, template, address, base)
+                operation, length = self._decode(address, base)
             if address + length <= 65536:
-                instructions.append((address, operation, self.snapshot[address:address + length]))
+                instructions.append((address, operation, snapshot[address:address + length]))
             else:
-                instructions.append(self._defb_line(address, self.snapshot[address:65536]))
+                instructions.append(self._defb_line(address, snapshot[address:65536]))
             address += length
         return instructions
 
+    def _decode(self, address, base):
+        decoder, template = self.ops[self.snapshot[address]]
+        if template == '':
+            return decoder(self, address, base)
+        return decoder(self, template, address, base)
+
+    def _build_decode_table(self, base):
+        formatters = {
+            BYTE_OP: self.op_formatter.format_byte,
+            WORD_OP: self.op_formatter.format_word,
+            JR_OP: self.op_formatter.format_word,
+            INDEX_OP: self._index_offset
+        }
+
+        def entry(decoder, template, prefix_len=1):
+            if decoder in self._op_types and template:
+                op_type, length = self._op_types[decoder]
+                if op_type != NO_OP:
+                    template = _OperationCache(template, formatters[op_type], base)
+                return (length + prefix_len, template, op_type)
+            return (0, None, OTHER)
+
+        def subtable(after):
+            return [entry(*after.get(i, (None, None))) for i in range(256)]
+
+        after_FD = {k: (v[0], v[1].replace('IX', 'IY').replace('ix', 'iy')) for k, v in self.after_DD.items()}
+        subtables = {
+            Disassembler.cb_arg: [entry(Disassembler.no_arg, self.after_CB.get(i)) for i in range(256)],
+            Disassembler.ed_arg: subtable(self.after_ED),
+            Disassembler.dd_arg: subtable(self.after_DD),
+            Disassembler.fd_arg: subtable(after_FD)
+        }
+        table = []
+        for opcode in range(256):
+            decoder, template = self.ops[opcode]
+            if decoder in subtables:
+                table.append((0, subtables[decoder], PREFIX))
+            else:
+                table.append(entry(decoder, template, 0))
+        return table
+
     def _defb_line(self, address, data, sublengths=((0, DEFAULT_BASE),), defm=False):
         return (address, self.defb_dir(data, sublengths, defm), data)
 
@@ -330,7 +405,9 @@ class Disassembler:
         return template.format(self.index_offset(a, base[0]), self.op_formatter.format_byte(self.snapshot[(a + 2) & 65535], base[-1])), 3
 
     def index_offset(self, a, base):
-        i = self.snapshot[(a + 1) & 65535]
+        return self._index_offset(self.snapshot[(a + 1) & 65535], base)
+
+    def _index_offset(self, i, base):
         if i < 128:
             return '+{}'.format(self.op_formatter.format_byte(i, base))
         return '-{}'.format(self.op_formatter.format_byte(abs(i - 256), base))
@@ -368,6 +445,14 @@ class Disassembler:
             return operation, 4
         return self._defb(a, 4)
 
+    _op_types = {
+        no_arg: (NO_OP, 1),
+        byte_arg: (BYTE_OP, 2),
+        word_arg: (WORD_OP, 3),
+        jr_arg: (JR_OP, 2),
+        index: (INDEX_OP, 2)
+    }
+
     ops = {
         0x00: (no_arg, 'NOP'),
         0x01: (word_arg, 'LD BC,{}'),
@@ -34,6 +34,11 @@ FLIP = (
     15, 143, 79, 207, 47, 175, 111, 239, 31, 159, 95, 223, 63, 191, 127, 255
 )
 
+# Bit spreading tables for rotating a tile packed into a 64-bit integer: bit k
+# of a byte is moved to bit 0 of byte 7-k (clockwise) or byte k (anticlockwise)
+SPREAD_CW = tuple(sum(1 << (56 - 8 * k) for k in range(8) if b & (1 << k)) for b in range(256))
+SPREAD_ACW = tuple(sum(1 << (8 * k) for k in range(8) if b & (1 << k)) for b in range(256))
+
 class Udg:
     """Initialise the UDG.
 
@@ -41,6 +46,8 @@ class Udg:
     :param data: The graphic data (sequence of 8 bytes).
     :param mask: The mask data (sequence of 8 bytes).
     """
+    __slots__ = ('attr', 'data', 'mask')
+
     def __init__(self, attr, data, mask=None):
         self.attr = attr
         self.data = data
@@ -57,6 +64,15 @@ class Udg:
         return False
 
     def _rotate_tile(self, tile_data, backwards=0):
+        if len(tile_data) == 8:
+            rotated = 0
+            if backwards:
+                for shift, byte in enumerate(tile_data):
+                    rotated |= SPREAD_ACW[byte & 255] << (7 - shift)
+            else:
+                for shift, byte in enumerate(tile_data):
+                    rotated |= SPREAD_CW[byte & 255] << shift
+            return list(rotated.to_bytes(8, 'little'))
         rotated = []
         if backwards:
             b = 1
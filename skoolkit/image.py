@@ -37,6 +37,7 @@ BRIGHT_CYAN = 'BRIGHT_CYAN'
 BRIGHT_YELLOW = 'BRIGHT_YELLOW'
 BRIGHT_WHITE = 'BRIGHT_WHITE'
 
+PNG_ADAPTIVE_COMPRESSION = 'PNGAdaptiveCompression'
 PNG_ALPHA = 'PNGAlpha'
 PNG_COMPRESSION_LEVEL = 'PNGCompressionLevel'
 PNG_ENABLE_ANIMATION = 'PNGEnableAnimation'
@@ -67,7 +68,8 @@ class ImageWriter:
             1: OrAndMask(),
             2: AndOrMask()
         }
-        self.writer = PngWriter(self.options[PNG_ALPHA] & 255, self.options[PNG_COMPRESSION_LEVEL], self.masks)
+        self.writer = PngWriter(self.options[PNG_ALPHA] & 255, self.options[PNG_COMPRESSION_LEVEL], self.masks,
+                                self.options[PNG_ADAPTIVE_COMPRESSION])
 
     def write_image(self, frames, img_file):
         use_flash = len(frames) == 1 and self.options[PNG_ENABLE_ANIMATION]
@@ -105,6 +107,7 @@ class ImageWriter:
 
     def _get_default_options(self):
         return {
+            PNG_ADAPTIVE_COMPRESSION: 0,
             PNG_COMPRESSION_LEVEL: 9,
             PNG_ENABLE_ANIMATION: 1,
             PNG_ALPHA: 255
@@ -187,11 +190,15 @@ class ImageWriter:
                 has_non_trans = False
                 if udg_whole:
                     # Uncropped UDG
-                    for i in range(8):
-                        pixels = mask.apply(udg, i, paper, ink, None)
-                        has_trans, has_non_trans = self._check_pixels(colours, pixels, ink, paper, has_trans, has_non_trans)
-                        if ink in colours and paper in colours and has_non_trans and (null_mask or has_trans):
-                            break
+                    paper_row, ink_row, udg_trans = mask.pixel_types(udg.data, udg.mask)
+                    if ink_row < 8 and ink_row <= paper_row:
+                        colours.add(ink)
+                    if paper_row < 8:
+                        colours.add(paper)
+                    if ink_row < 8:
+                        colours.add(ink)
+                    has_non_trans = paper_row < 8 or ink_row < 8
+                    has_trans = has_trans or udg_trans
                 else:
                     # Cropped UDG
                     min_k = max(0, (x0 - x) // scale)
@@ -257,7 +264,18 @@ class ImageWriter:
 
         return palette, attr_map, has_trans
 
+def _first_row(rows):
+    return next((i for i, pixels in enumerate(rows) if pixels), 8)
+
 class NoMask:
+    def pixel_types(self, data, mask):
+        data = data[:8]
+        ink_row = _first_row(data)
+        if ink_row:
+            # Row 0 is all paper
+            return 0, ink_row, False
+        return 0 if min(data) < 255 else 8, 0, False
+
     def apply(self, udg, row, paper, ink, trans):
         udg_byte = udg.data[row]
         pixels = [paper] * 8
@@ -270,6 +288,13 @@ class NoMask:
         return pixels
 
 class OrAndMask:
+    def pixel_types(self, data, mask):
+        data = data[:8]
+        mask = mask[:8] if mask else data
+        ink_row = _first_row([b & m for b, m in zip(data, mask)])
+        has_trans = any(m & ~b for b, m in zip(data, mask))
+        return _first_row([m != 255 for m in mask]), ink_row, has_trans
+
     def apply(self, udg, row, paper, ink, trans):
         udg_byte = udg.data[row]
         if udg.mask:
@@ -298,6 +323,13 @@ class OrAndMask:
         )
 
 class AndOrMask:
+    def pixel_types(self, data, mask):
+        data = data[:8]
+        mask = mask[:8] if mask else data
+        paper_row = _first_row([b | m != 255 for b, m in zip(data, mask)])
+        has_trans = any(m & ~b for b, m in zip(data, mask))
+        return paper_row, _first_row(data), has_trans
+
     def apply(self, udg, row, paper, ink, trans):
         udg_byte = udg.data[row]
         if udg.mask:
@@ -938,3 +938,23 @@ def decode(snapshot, start, end):
             size, max_count, op_id, operation = _opcode(snapshot, addr, value)
         yield (addr, size, max_count, op_id, operation)
         addr += size
+
+class DecodeCache:
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.instructions = {}
+
+    def decode(self, start, end):
+        addr = start
+        while addr < end:
+            instruction = self.get(addr)
+            yield instruction
+            addr += instruction[1]
+
+    def get(self, addr):
+        cached = self.instructions.get(addr)
+        if cached and self.snapshot[addr:addr + cached[0][1]] == cached[1]:
+            return cached[0]
+        instruction = next(decode(self.snapshot, addr, addr + 1))
+        self.instructions[addr] = (instruction, self.snapshot[addr:addr + instruction[1]])
+        return instruction
@@ -14,7 +14,12 @@
 # You should have received a copy of the GNU General Public License along with
 # SkoolKit. If not, see <http://www.gnu.org/licenses/>.
 
+import os
 import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from skoolkit.graphics import Frame
 
 # http://www.libpng.org/pub/png/spec/iso/index-object.html
 # https://wiki.mozilla.org/APNG_Specification
@@ -27,7 +32,15 @@ IDAT = bytes((73, 68, 65, 84))
 FDAT = bytes((102, 100, 65, 84))
 FDAT2 = bytes((102, 100, 65, 84, 0, 0, 0, 2))
 IEND_CHUNK = bytes((0, 0, 0, 0, 73, 69, 78, 68, 174, 66, 96, 130))
-CRC_MASK = 4294967295
+
+# Size of the raw image data above which adaptive compression uses a lower
+# compression level (and the level to use)
+ADAPTIVE_SIZE = 32768
+ADAPTIVE_LEVEL = 6
+
+# Maximum number of threads to use for compressing the frames of an animated
+# image
+MAX_WORKERS = 4
 
 BITS4 = [[int(d) for d in '{:04b}'.format(n)] for n in range(16)]
 BIT_PAIRS = [[((n << m) & 128) // 64 + ((n << m) & 8) // 8 for m in range(4)] for n in range(256)]
@@ -49,11 +62,11 @@ def _get_bytes(depth, scale):
     return bd_bytes[scale]
 
 class PngWriter:
-    def __init__(self, alpha=255, compression_level=9, masks=None):
+    def __init__(self, alpha=255, compression_level=9, masks=None, adaptive=0):
         self.alpha = alpha
         self.compression_level = compression_level
+        self.adaptive = adaptive
         self.masks = masks
-        self._create_crc_table()
         self._create_png_method_dict()
 
     def write_image(self, frames, img_file, palette, attr_map, has_trans, flash_rect):
@@ -93,34 +106,67 @@ class PngWriter:
             self._write_fctl_chunk(img_file, seq_num, frame1.delay, width, height)
 
         # IDAT
-        self._write_img_data_chunk(img_file, IDAT + frame1_data)
+        self._write_img_data_chunk(img_file, IDAT, frame1_data)
 
         # fcTL and fdAT
         if len(frames) == 1 and flash_rect:
             f2_x_offset, f2_y_offset, f2_width, f2_height = flash_rect
             self._write_fctl_chunk(img_file, 1, frame1.delay, f2_width, f2_height, f2_x_offset, f2_y_offset)
-            self._write_img_data_chunk(img_file, FDAT2 + frame2_data)
-        for frame in frames[1:]:
-            frame_data = self._build_image_data(frame, palette_size, bit_depth, attr_map)[0]
-            seq_num += 1
-            self._write_fctl_chunk(img_file, seq_num, frame.delay, frame.width, frame.height)
-            seq_num += 1
-            fdat = FDAT + bytes(self._to_bytes(seq_num))
-            self._write_img_data_chunk(img_file, fdat + frame_data)
+            self._write_img_data_chunk(img_file, FDAT2, frame2_data)
+        if len(frames) > 1:
+            # Build the remaining frames one at a time, compressing each one
+            # in a worker thread (zlib releases the GIL) while the next is
+            # being built, and write them out in order as they complete
+            workers = min(MAX_WORKERS, os.cpu_count() or 1)
+            pending = deque()
+            prev_frame = frame1
+            with ThreadPoolExecutor(workers) as executor:
+                for frame in frames[1:]:
+                    sub_frame, x_offset, y_offset = self._get_changed_region(prev_frame, frame)
+                    prev_frame = frame
+                    frame_data = self._build_raw_data(sub_frame, palette_size, bit_depth, attr_map)
+                    pending.append((sub_frame, x_offset, y_offset, executor.submit(self._compress, frame_data)))
+                    if len(pending) > workers:
+                        seq_num = self._write_frame(img_file, seq_num, *pending.popleft())
+                while pending:
+                    seq_num = self._write_frame(img_file, seq_num, *pending.popleft())
 
         # IEND
         img_file.write(IEND_CHUNK)
 
-    def _create_crc_table(self):
-        self.crc_table = []
-        for i in range(256):
-            c = i
-            for k in range(8):
-                if c & 1:
-                    c = 3988292384 ^ (c >> 1)
-                else:
-                    c = c >> 1
-            self.crc_table.append(c)
+    def _get_changed_region(self, prev_frame, frame):
+        # Reduce a frame to the smallest block of tiles that differ from the
+        # previous frame (which, since each frame is composited over the last
+        # one, is all that needs to be drawn) if the frames are the same size
+        # and both are non-empty rectangles of tiles
+        udgs, prev_udgs = frame.udgs, prev_frame.udgs
+        widths = [len(r) for r in udgs]
+        if (frame.cropped or prev_frame.cropped or frame.scale != prev_frame.scale or frame.mask != prev_frame.mask
+                or widths != [len(r) for r in prev_udgs] or not widths or min(widths) != max(widths) or not widths[0]):
+            return frame, 0, 0
+        rows = [i for i, (r1, r2) in enumerate(zip(prev_udgs, udgs)) if r1 != r2]
+        if rows:
+            r0, r1 = rows[0], rows[-1] + 1
+            cols = [j for j in range(len(udgs[0])) if any(prev_udgs[i][j] != udgs[i][j] for i in range(r0, r1))]
+            c0, c1 = cols[0], cols[-1] + 1
+            if r1 - r0 == len(udgs) and c1 - c0 == len(udgs[0]):
+                return frame, 0, 0
+        else:
+            # The frame is identical to the previous one, but an APNG frame
+            # cannot be empty, so redraw the top-left tile
+            r0, r1, c0, c1 = 0, 1, 0, 1
+        sub_frame = Frame([row[c0:c1] for row in udgs[r0:r1]], frame.scale, frame.mask, delay=frame.delay)
+        sub_frame.has_masks = frame.has_masks
+        inc = 8 * frame.scale
+        return sub_frame, c0 * inc, r0 * inc
+
+    def _write_frame(self, img_file, seq_num, frame, x_offset, y_offset, frame_data):
+        seq_num += 1
+        self._write_fctl_chunk(img_file, seq_num, frame.delay, frame.width, frame.height, x_offset, y_offset)
+        seq_num += 1
+        fdat = FDAT + bytes(self._to_bytes(seq_num))
+        self._write_img_data_chunk(img_file, fdat, frame_data.result())
+        return seq_num
 
     def _create_png_method_dict(self):
         # The PNG method dictionary is keyed on:
@@ -197,21 +243,39 @@ class PngWriter:
             bit_depth = 1
         return bit_depth, palette_size
 
-    def _build_image_data(self, frame, palette_size, bit_depth, attr_map, flash_rect=None):
+    def _get_build_method(self, frame, palette_size, bit_depth):
         masked = frame.mask and frame.has_masks
-        if masked:
-            mask = self.masks[frame.mask]
-        else:
-            mask = self.masks[0]
         full_size = not frame.cropped
         if palette_size == 1:
             bd = 0
         else:
             bd = bit_depth
-        build_method = self.png_method_dict[bd][full_size][masked]
+        return self.png_method_dict[bd][full_size][masked]
+
+    def _get_mask(self, frame):
+        if frame.mask and frame.has_masks:
+            return self.masks[frame.mask]
+        return self.masks[0]
+
+    def _build_raw_data(self, frame, palette_size, bit_depth, attr_map):
         frame.attr_map = attr_map
+        build_method = self._get_build_method(frame, palette_size, bit_depth)
+        return build_method(frame, self._get_mask(frame), bit_depth)
 
-        frame1 = build_method(frame, mask, bit_depth)
+    def _compress(self, img_data):
+        level = self.compression_level
+        if self.adaptive and len(img_data) > ADAPTIVE_SIZE:
+            # Beyond the size of a full screen at scale 1, level 9 takes
+            # several times as long as level 6 for less than 1% gain
+            level = min(level, ADAPTIVE_LEVEL)
+        return zlib.compress(img_data, level)
+
+    def _build_image_data(self, frame, palette_size, bit_depth, attr_map, flash_rect=None):
+        mask = self._get_mask(frame)
+        build_method = self._get_build_method(frame, palette_size, bit_depth)
+        frame.attr_map = attr_map
+
+        frame1 = self._compress(build_method(frame, mask, bit_depth))
 
         # Frame 2
         frame2 = None
@@ -223,28 +287,23 @@ class PngWriter:
                 new_attr = (attr & 192) + (attr & 7) * 8 + (attr & 56) // 8
                 f2_attr_map[new_attr] = (ink, paper)
             f2_frame.attr_map = f2_attr_map
-            frame2 = build_method(f2_frame, mask, bit_depth)
+            frame2 = self._compress(build_method(f2_frame, mask, bit_depth))
 
         return frame1, frame2
 
-    def _get_crc(self, byte_list):
-        crc = CRC_MASK
-        for b in byte_list:
-            crc = self.crc_table[(crc ^ b) & 255] ^ (crc >> 8)
-        return self._to_bytes(crc ^ CRC_MASK)
-
     def _write_chunk(self, img_file, chunk_data):
+        chunk_data = bytes(chunk_data)
         img_file.write(bytes(self._to_bytes(len(chunk_data) - 4))) # length
-        img_file.write(bytes(chunk_data))
-        img_file.write(bytes(self._get_crc(chunk_data))) # CRC
+        img_file.write(chunk_data)
+        img_file.write(bytes(self._to_bytes(zlib.crc32(chunk_data)))) # CRC
 
-    def _write_img_data_chunk(self, img_file, img_data):
-        img_file.write(bytes(self._to_bytes(len(img_data) - 4))) # length
+    def _write_img_data_chunk(self, img_file, chunk_header, img_data):
+        img_file.write(bytes(self._to_bytes(len(chunk_header) + len(img_data) - 4))) # length
+        img_file.write(chunk_header)
         img_file.write(img_data)
-        img_file.write(bytes(self._get_crc(img_data))) # CRC
+        img_file.write(bytes(self._to_bytes(zlib.crc32(img_data, zlib.crc32(chunk_header))))) # CRC
 
     def _scan_frame(self, frame, scan_udg_f, *args):
-        compressor = zlib.compressobj(self.compression_level)
         img_data = bytearray()
         scale = frame.scale
         for row in frame.udgs:
@@ -254,20 +313,18 @@ class PngWriter:
             )
             for udg in row:
                 scan_udg_f(udg, scanlines, *args)
-            img_data.extend(compressor.compress(scanlines[0] * scale))
-            img_data.extend(compressor.compress(scanlines[1] * scale))
-            img_data.extend(compressor.compress(scanlines[2] * scale))
-            img_data.extend(compressor.compress(scanlines[3] * scale))
-            img_data.extend(compressor.compress(scanlines[4] * scale))
-            img_data.extend(compressor.compress(scanlines[5] * scale))
-            img_data.extend(compressor.compress(scanlines[6] * scale))
-            img_data.extend(compressor.compress(scanlines[7] * scale))
-        img_data.extend(compressor.flush())
+            img_data.extend(scanlines[0] * scale)
+            img_data.extend(scanlines[1] * scale)
+            img_data.extend(scanlines[2] * scale)
+            img_data.extend(scanlines[3] * scale)
+            img_data.extend(scanlines[4] * scale)
+            img_data.extend(scanlines[5] * scale)
+            img_data.extend(scanlines[6] * scale)
+            img_data.extend(scanlines[7] * scale)
         return img_data
 
     def _build_image_data_bd_any(self, frame, mask, bit_depth):
         # Build image data at any bit depth using a generic method
-        compressor = zlib.compressobj(self.compression_level)
         img_data = bytearray()
         scale = frame.scale
         attrs = frame.attr_map
@@ -323,16 +380,15 @@ class PngWriter:
                 else:
                     r = ''.join(p)[p0:p1] + padding
                     scanlines[i].extend([int(r[n:n + digits], base) for n in range(0, len(r), digits)])
-            img_data.extend(compressor.compress(scanlines[k0] * rows))
+            img_data.extend(scanlines[k0] * rows)
             y += (k1 - k0) * scale
             if k1 > k0 + 1:
                 for i in range(k0 + 1, k1 - 1):
-                    img_data.extend(compressor.compress(scanlines[i] * scale))
-                img_data.extend(compressor.compress(scanlines[k1 - 1] * min(scale, y1 - y + scale)))
+                    img_data.extend(scanlines[i] * scale)
+                img_data.extend(scanlines[k1 - 1] * min(scale, y1 - y + scale))
             rows = min(scale, y1 - y)
             k0, k1 = 0, min(8, 1 + (y1 - y - 1) // scale)
 
-        img_data.extend(compressor.flush())
         return img_data
 
     def _scan_udg_bd4_nt(self, udg, scanlines, attrs):
@@ -500,5 +556,4 @@ class PngWriter:
         # 1 colour (i.e. blank), full size; placing the integer value in
         # brackets means it is evaluated before 'multiplying' the tuple (and is
         # therefore quicker)
-        scanlines = bytearray((0,) * ((1 + frame.width // 8) * frame.height))
-        return zlib.compress(scanlines, self.compression_level)
+        return bytearray((0,) * ((1 + frame.width // 8) * frame.height))
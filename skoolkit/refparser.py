@@ -69,6 +69,10 @@ class RefParser:
             sections[repf(name)] = [repf(line) for line in self._sections[name]]
         self._sections = sections
 
+    def get_section_names(self):
+        """Return a list of the names of all the sections."""
+        return list(self._sections)
+
     def has_section(self, section_name):
         """Return whether there is any section named `section_name`."""
         return section_name in self._sections
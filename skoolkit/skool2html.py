@@ -15,8 +15,10 @@
 # SkoolKit. If not, see <http://www.gnu.org/licenses/>.
 
 import glob
+import multiprocessing
 import sys
 import os
+import re
 from os.path import isfile, isdir, basename, dirname
 import shutil
 import time
@@ -216,7 +218,7 @@ def run(infiles, options):
         topdir = ''
     else:
         topdir = normpath(options.output_dir)
-    file_info = FileInfo(topdir, game_dir, options.new_images)
+    file_info = FileInfo(topdir, game_dir, options.new_images, options.incremental)
     html_writer = html_writer_class(skool_parser, ref_parser, file_info)
 
     # Check that the specified pages exist
@@ -226,9 +228,88 @@ def run(infiles, options):
             raise SkoolKitError('Invalid page ID: {0}'.format(page_id))
     pages = options.pages or all_page_ids
 
-    write_disassembly(html_writer, options.files, ref_search_dir, options.search, pages, options.themes, options.single_css)
+    write_disassembly(html_writer, options.files, ref_search_dir, options.search, pages, options.themes, options.single_css, options.jobs)
+
+# Macros that change state shared between pages: the memory snapshot, the
+# macros defined by #DEFINE, the variables defined by #LET, and the named
+# frames that #UDGARRAY* may refer to
+SHARED_STATE_MACROS = re.compile(r'#(DEFINE|LET|POKES|POPS|PUSHS|UDGARRAY\*)')
+
+def _uses_shared_state(html_writer):
+    texts = list(html_writer.parser.expands)
+    def add_text(text):
+        texts.append(text)
+        return text
+    html_writer.parser.apply_replacements(add_text)
+    html_writer.ref_parser.apply_replacements(add_text)
+    return any(SHARED_STATE_MACROS.search(t) for t in texts)
+
+def _write_files(task):
+    method_name, args = task
+    file_info = _html_writer.file_info
+    if file_info.staged_images is None:
+        # Image files are written to temporary files first, and then moved
+        # into place by the parent process in the order that a serial run
+        # would have written them
+        file_info.staged_images = {}
+    staged = set(file_info.staged_images)
+    file_info.digests = {}
+    file_info.page_images = {}
+    getattr(_html_writer, method_name)(*args)
+    images = {k: v for k, v in file_info.staged_images.items() if k not in staged}
+    return file_info.digests, file_info.page_images, images
+
+class FileWriter:
+    def __init__(self, jobs):
+        # The 'fork' start method is unavailable on Windows and unsafe on macOS
+        self.use_pool = jobs > 1 and sys.platform != 'darwin' and 'fork' in multiprocessing.get_all_start_methods()
+        self.jobs = jobs
+        self.parallel = False
+        self.html_writer = None
+        self.tasks = []
+
+    def set_writer(self, html_writer):
+        self.finish()
+        self.html_writer = html_writer
+        # A page's digest does not cover state that it shares with other
+        # pages, so such pages must be written in order and never skipped
+        shared_state = (self.use_pool or html_writer.file_info.incremental) and _uses_shared_state(html_writer)
+        self.parallel = self.use_pool and not shared_state
+        html_writer.skip_current_pages = not shared_state
+
+    def write(self, message, method_name, *args):
+        if self.parallel:
+            notify(message)
+            self.tasks.append((method_name, args))
+        else:
+            clock(getattr(self.html_writer, method_name), message, *args)
 
-def write_disassembly(html_writer, files, search_dir, extra_search_dirs, pages, css_themes, single_css):
+    def write_entries(self, message, cwd, map_file):
+        if self.parallel and not self.html_writer.asm_single_page:
+            notify(message)
+            for i in range(len(self.html_writer.memory_map)):
+                self.tasks.append(('write_entry', (cwd, i, map_file)))
+        else:
+            self.write(message, 'write_entries', cwd, map_file)
+
+    def finish(self):
+        global _html_writer
+        if self.tasks:
+            _html_writer = self.html_writer
+            clock(self._run_tasks, 'Writing files using {} jobs'.format(self.jobs))
+            _html_writer = None
+            self.tasks = []
+
+    def _run_tasks(self):
+        file_info = self.html_writer.file_info
+        with multiprocessing.get_context('fork').Pool(self.jobs) as pool:
+            for digests, page_images, staged_images in pool.map(_write_files, self.tasks):
+                for fname, digest in digests.items():
+                    file_info.digests.setdefault(fname, digest)
+                file_info.page_images.update(page_images)
+                file_info.add_staged_images(staged_images)
+
+def write_disassembly(html_writer, files, search_dir, extra_search_dirs, pages, css_themes, single_css, jobs=1):
     paths = html_writer.paths
     game_vars = html_writer.game_vars
 
@@ -238,6 +319,10 @@ def write_disassembly(html_writer, files, search_dir, extra_search_dirs, pages,
         os.makedirs(odir)
     notify('Output directory: ' + odir)
 
+    # A full rebuild invalidates the manifest of any earlier incremental build
+    if not html_writer.file_info.incremental:
+        html_writer.file_info.remove_manifest()
+
     # Copy CSS, JavaScript and font files if necessary
     html_writer.set_style_sheet(copy_resources(search_dir, extra_search_dirs, odir, game_vars.get('StyleSheet'), paths.get('StyleSheetPath', ''), css_themes, '.css', single_css))
     js_path = paths.get('JavaScriptPath', '')
@@ -257,25 +342,31 @@ def write_disassembly(html_writer, files, search_dir, extra_search_dirs, pages,
             if os.path.isfile(fname):
                 copy_resource(fname, odir, dest_dir)
 
+    file_writer = FileWriter(jobs)
+    file_writer.set_writer(html_writer)
+
     # Write disassembly files
     if 'd' in files:
         if html_writer.asm_single_page:
             message = 'Writing ' + normpath(paths['AsmSinglePage'])
         else:
             message = 'Writing disassembly files in ' + normpath(html_writer.code_path)
-        clock(html_writer.write_asm_entries, message)
+        if file_writer.parallel:
+            file_writer.write_entries(message, html_writer.code_path, paths['MemoryMap'])
+        else:
+            clock(html_writer.write_asm_entries, message)
 
     # Write the memory map files
     if 'm' in files:
         for map_name in html_writer.main_memory_maps:
-            clock(html_writer.write_map, 'Writing ' + normpath(paths[map_name]), map_name)
+            file_writer.write('Writing ' + normpath(paths[map_name]), 'write_map', map_name)
 
     # Write pages defined by [Page:*] sections
     if 'P' in files:
         for page_id in pages:
             page_details = html_writer.pages[page_id]
             copy_resources(search_dir, extra_search_dirs, odir, page_details.get('JavaScript'), js_path)
-            clock(html_writer.write_page, 'Writing ' + normpath(paths[page_id]), page_id)
+            file_writer.write('Writing ' + normpath(paths[page_id]), 'write_page', page_id)
 
     # Write other code files
     if 'o' in files:
@@ -284,21 +375,27 @@ def write_disassembly(html_writer, files, search_dir, extra_search_dirs, pages,
             if not skoolfile:
                 raise SkoolKitError('{}: file not found'.format(normpath(code['Source'])))
             skool2_parser = clock(html_writer.parser.clone, 'Parsing ' + normpath(skoolfile), skoolfile)
+            file_writer.finish()
             html_writer2 = html_writer.clone(skool2_parser, code_id)
+            file_writer.set_writer(html_writer2)
             map_name = code['IndexPageId']
             map_path = paths[map_name]
             asm_path = paths[code['CodePathId']]
-            clock(html_writer2.write_map, 'Writing ' + normpath(map_path), map_name)
+            file_writer.write('Writing ' + normpath(map_path), 'write_map', map_name)
             if html_writer.asm_single_page:
                 message = 'Writing ' + normpath(paths[code['AsmSinglePageId']])
             else:
                 message = 'Writing disassembly files in ' + normpath(asm_path)
-            clock(html_writer2.write_entries, message, asm_path, map_path)
+            file_writer.write_entries(message, asm_path, map_path)
+
+    file_writer.finish()
 
     # Write index.html
     if 'i' in files:
         clock(html_writer.write_index, 'Writing ' + normpath(paths['GameIndex']))
 
+    html_writer.file_info.write_manifest()
+
 def main(args):
     global verbose, show_timings
 
@@ -332,6 +429,11 @@ def main(args):
                        help="Set the value of the configuration parameter 'p' to\n'v'. This option may be used multiple times.")
     group.add_argument('-j', '--join-css', dest='single_css', metavar='NAME', default=config['JoinCss'],
                        help="Concatenate CSS files into a single file with this name.")
+    group.add_argument('--incremental', dest='incremental', action='store_const', const=1, default=config['Incremental'],
+                       help="Skip writing disassembly pages and memory maps whose\n"
+                            "inputs have not changed since the last run.")
+    group.add_argument('--jobs', dest='jobs', metavar='N', type=int, default=config['Jobs'],
+                       help="Write files using this many worker processes (default: 1).")
     group.add_argument('-l', '--lower', dest='case', action='store_const', const=CASE_LOWER, default=config['Case'],
                        help="Write the disassembly in lower case.")
     group.add_argument('-o', '--rebuild-images', dest='new_images', action='store_const', const=1, default=config['RebuildImages'],
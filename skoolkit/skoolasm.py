@@ -20,6 +20,7 @@ from skoolkit import (CASE_LOWER, skoolmacro, SkoolKitError, SkoolParsingError,
                       format_template, warn, write_text, wrap)
 from skoolkit.skoolparser import (TableParser, ListParser, TABLE_MARKER, TABLE_END_MARKER,
                                   LIST_MARKER, LIST_END_MARKER)
+from skoolkit.snapshot import ByteMemory, Memory
 
 BLOCK_SEP = '\x00'
 
@@ -212,7 +213,11 @@ class AsmWriter:
         by :meth:`~skoolkit.skoolasm.AsmWriter.push_snapshot`."""
         if len(self._snapshots) < 2:
             raise SkoolKitError("Cannot pop snapshot when snapshot stack is empty")
-        self.snapshot[:] = self._snapshots.pop()[0]
+        snapshot = self._snapshots.pop()[0]
+        if snapshot is None:
+            self.snapshot.restore()
+        else:
+            self.snapshot[:] = snapshot
 
     def push_snapshot(self, name=''):
         """Save a copy of the current memory snapshot for later retrieval (by
@@ -220,7 +225,11 @@ class AsmWriter:
 
         :param name: An optional name for the snapshot.
         """
-        self._snapshots.append((self.snapshot[:], name))
+        if isinstance(self.snapshot, (Memory, ByteMemory)):
+            self.snapshot.save()
+            self._snapshots.append((None, name))
+        else:
+            self._snapshots.append((self.snapshot[:], name))
 
     def expand_font(self, text, index):
         if self.handle_unsupported_macros:
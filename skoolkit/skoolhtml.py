@@ -19,20 +19,25 @@ Defines the :class:`FileInfo` and :class:`HtmlWriter` classes.
 """
 
 from html import unescape
+import hashlib
+import json
 import posixpath
 import os.path
+import shutil
+import tempfile
 from os.path import isfile, isdir, basename
 from collections import defaultdict
 import re
 from io import StringIO
 
-from skoolkit import skoolmacro, SkoolKitError, evaluate, format_template, parse_int, warn
+from skoolkit import skoolmacro, SkoolKitError, VERSION, evaluate, format_template, parse_int, warn
 from skoolkit.components import get_component
 from skoolkit.defaults import REF_FILE
 from skoolkit.graphics import Frame, adjust_udgs, build_udg, font_udgs, scr_udgs
 from skoolkit.image import ImageWriter
 from skoolkit.refparser import RefParser
 from skoolkit.skoolparser import TableParser, ListParser
+from skoolkit.snapshot import ByteMemory, Memory
 
 #: The ID of the main disassembly.
 MAIN_CODE_ID = 'main'
@@ -50,9 +55,29 @@ UDG_IMAGE_PATH = 'UDGImagePath'
 # Default memory map entry types
 DEF_MEMORY_MAP_ENTRY_TYPES = 'bcgstuw'
 
+# Name of the file in which page digests are stored
+MANIFEST = '.skool2html-manifest'
+
 def join(*path_components):
     return '/'.join([c for c in path_components if c.replace('/', '')])
 
+def _entry_inputs(entry):
+    instructions = []
+    for i in entry.instructions:
+        if i.reference:
+            ref = (i.reference.address, i.reference.addr_str, i.reference.use_label, i.reference.entry.address, i.reference.entry.asm_id)
+        else:
+            ref = None
+        if i.comment:
+            comment = (i.comment.rowspan, i.comment.text)
+        else:
+            comment = None
+        instructions.append((i.address, i.addr_str, i.ctl, i.operation, tuple(i.bytes), i.asm_label,
+                             i.mid_block_comment, comment, ref, [r.address for r in i.referrers]))
+    registers = [(r.delimiters, r.prefix, r.name, r.contents) for r in entry.registers]
+    return (entry.address, entry.ctl, entry.description, entry.details, registers, instructions,
+            entry.end_comment, [r.address for r in entry.referrers])
+
 class HtmlWriter:
     """Converts a skool file and its associated ref files to HTML.
 
@@ -81,9 +106,12 @@ class HtmlWriter:
 
         self.snapshot = self.parser.snapshot
         self._snapshots = [(self.snapshot, '')]
+        self._base_digest = None
+        self.skip_current_pages = True
         self.asm_entry_dicts = {}
         self.map_entry_dicts = {}
         self.nonexistent_entry_dict = defaultdict(lambda: '', exists=0)
+        self._r_links = {}
         self.memory_map = [e for e in self.parser.memory_map if e.ctl != 'i']
 
         self.table_parser = TableParser()
@@ -423,7 +451,11 @@ class HtmlWriter:
         by :meth:`~skoolkit.skoolhtml.HtmlWriter.push_snapshot`."""
         if len(self._snapshots) < 2:
             raise SkoolKitError("Cannot pop snapshot when snapshot stack is empty")
-        self.snapshot[:] = self._snapshots.pop()[0]
+        snapshot = self._snapshots.pop()[0]
+        if snapshot is None:
+            self.snapshot.restore()
+        else:
+            self.snapshot[:] = snapshot
 
     # API
     def push_snapshot(self, name=''):
@@ -432,7 +464,11 @@ class HtmlWriter:
 
         :param name: An optional name for the snapshot.
         """
-        self._snapshots.append((self.snapshot[:], name))
+        if isinstance(self.snapshot, (Memory, ByteMemory)):
+            self.snapshot.save()
+            self._snapshots.append((None, name))
+        else:
+            self._snapshots.append((self.snapshot[:], name))
 
     def get_page_ids(self):
         return self.page_ids
@@ -715,10 +751,32 @@ class HtmlWriter:
 
         return entry_dict
 
+    def _digest(self, *inputs):
+        if self._base_digest is None:
+            ref = [(s, self.ref_parser.get_section(s, trim=False)) for s in self.ref_parser.get_section_names()]
+            entries = []
+            for entry in self.parser.memory_map:
+                addresses = [(i.address, i.addr_str, i.asm_label) for i in entry.instructions]
+                entries.append((entry.address, entry.ctl, entry.asm_id, entry.description, addresses))
+            base = (VERSION, type(self).__module__, type(self).__name__, self.code_id, self.asm_single_page,
+                    sorted(self.game_vars.items()), ref, self.fields, self.snapshot, entries)
+            self._base_digest = hashlib.sha1(repr(base).encode('utf-8')).hexdigest()
+        return hashlib.sha1(repr((self._base_digest,) + inputs).encode('utf-8')).hexdigest()
+
+    def _is_current(self, fname, *inputs):
+        if self.file_info.incremental:
+            # The digest is recorded even if the page is going to be written
+            # anyway, so that the manifest is correct for the next run
+            is_current = self.file_info.is_current_page(fname, self._digest(*inputs))
+            return is_current and self.skip_current_pages
+        return False
+
     def write_entry(self, cwd, index, map_file):
         entry = self.memory_map[index]
         page_id = self._get_asm_page_id(self.code_id, entry.ctl)
         fname = join(cwd, self.asm_fname(entry.address))
+        if self._is_current(fname, map_file, _entry_inputs(entry)):
+            return
         self._set_cwd(page_id, 'asm', fname)
 
         subs = {'entry': self._get_asm_entry(cwd, index, map_file)}
@@ -742,6 +800,8 @@ class HtmlWriter:
 
     def _write_asm_single_page(self, map_file):
         page_id = self._get_asm_page_id(self.code_id)
+        if self._is_current(self.paths[page_id], map_file, [_entry_inputs(e) for e in self.memory_map]):
+            return
         fname, cwd = self._set_cwd(page_id, 'asm_single_page')
         asm_entries = [self._get_asm_entry(cwd, i, map_file) for i in range(len(self.memory_map))]
         html = self.format_template(T_LAYOUT, {'entries': asm_entries})
@@ -766,6 +826,8 @@ class HtmlWriter:
         return any([entry.ctl in entry_types for entry in self.memory_map])
 
     def write_map(self, map_name):
+        if self._is_current(self.paths[map_name], map_name, [(e.address, e.details) for e in self.memory_map]):
+            return
         fname, cwd = self._set_cwd(map_name, 'memory_map')
 
         map_details = self.memory_maps.get(map_name, {})
@@ -826,6 +888,8 @@ class HtmlWriter:
         else:
             fname = asm_fname
         cwd = os.path.dirname(fname)
+        if self.file_info.incremental:
+            self.file_info.set_page(fname)
 
         if cwd not in self.stylesheets:
             for css_file in self.game_vars['StyleSheet'].split(';'):
@@ -909,18 +973,34 @@ class HtmlWriter:
             self.frames[frames[0].name] = frames[0]
         image_path = self._image_path(fname, path_id)
         if image_path:
-            if self.file_info.need_image(image_path):
-                self._write_image(image_path, frames)
+            if self.file_info.incremental:
+                digest = self._image_digest(frames)
+                self.file_info.add_page_image(image_path)
+            else:
+                digest = None
+            if self.file_info.need_image(image_path, digest):
+                self._write_image(image_path, frames, digest)
             if alt is None:
                 alt = basename(image_path)[:-4]
             return self.format_img(alt, self.relpath(cwd, image_path))
         return ''
 
-    def _write_image(self, image_path, frames):
-        f = self.file_info.open_file(image_path, mode='wb')
-        self.image_writer.write_image(frames, f)
+    def _write_image(self, image_path, frames, digest=None):
+        f = self.file_info.open_image(image_path)
+        source = self.file_info.find_image(digest)
+        if source:
+            with open(source, 'rb') as src:
+                shutil.copyfileobj(src, f)
+        else:
+            self.image_writer.write_image(frames, f)
         f.close()
-        self.file_info.add_image(image_path)
+        self.file_info.add_image(image_path, digest)
+
+    def _image_digest(self, frames):
+        iw = self.image_writer
+        data = [(f.udgs, f.scale, f.mask, f.x, f.y, f.width, f.height, f.delay, f.tindex, f.alpha) for f in frames]
+        inputs = (VERSION, sorted(iw.options.items()), iw.colours, data)
+        return hashlib.sha1(repr(inputs).encode('utf-8')).hexdigest()
 
     def build_table(self, table):
         rows = []
@@ -1029,6 +1109,14 @@ class HtmlWriter:
 
     def expand_r(self, text, index, cwd):
         end, addr_str, address, code_id, anchor, link_text = skoolmacro.parse_r(text, index)
+        key = (cwd, addr_str, address, code_id, anchor)
+        link = self._r_links.get(key)
+        if link is None:
+            link = self._r_links[key] = self._get_r_link(cwd, addr_str, address, code_id, anchor)
+        href, default_link_text = link
+        return end, self.format_link(href, link_text or default_link_text)
+
+    def _get_r_link(self, cwd, addr_str, address, code_id, anchor):
         container = self.parser.get_container(address, code_id)
         if (not code_id or code_id == self.code_id) and not container:
             raise skoolmacro.MacroParsingError('Could not find instruction at {}'.format(addr_str))
@@ -1050,7 +1138,7 @@ class HtmlWriter:
             href = self._asm_relpath(cwd, container_address, code_id) + anchor
         asm_label = self.parser.get_asm_label(address)
         inst_addr_str = self.parser.get_instruction_addr_str(address, addr_str, code_id)
-        return end, self.format_link(href, link_text or asm_label or inst_addr_str)
+        return href, asm_label or inst_addr_str
 
     def expand_scr(self, text, index, cwd):
         end, crop_rect, fname, frame, alt, params = skoolmacro.parse_scr(text, index)
@@ -1107,29 +1195,130 @@ class FileInfo:
     :param game_dir: The subdirectory of `topdir` in which to write all HTML
                      files and image files.
     :param replace_images: Whether existing images should be overwritten.
+    :param incremental: Whether to skip writing pages whose inputs have not
+                        changed since they were last written.
     """
-    def __init__(self, topdir, game_dir, replace_images):
+    def __init__(self, topdir, game_dir, replace_images, incremental=False):
         self.odir = join(topdir, game_dir)
         self.replace_images = replace_images
         self.images = set()
+        self.image_digests = {}
+        self.incremental = incremental
+        self.digests = {}
+        self.page_images = {}
+        self.hashes = {}
+        self.manifest = {}
+        self.manifest_images = {}
+        self.manifest_hashes = {}
+        self.page = None
+        self.staged_images = None
+        if incremental:
+            manifest = join(self.odir, MANIFEST)
+            if isfile(manifest):
+                try:
+                    with open(manifest) as f:
+                        contents = json.load(f)
+                    self.manifest = contents['digests']
+                    self.manifest_images = contents['images']
+                    self.manifest_hashes = contents['hashes']
+                except (ValueError, KeyError, TypeError):
+                    self.manifest = {}
 
     def open_file(self, *names, mode='w'):
         path = self.odir
         for name in names:
             path = join(path, name)
         if not isdir(os.path.dirname(path)):
-            os.makedirs(os.path.dirname(path))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
         return open(path, mode, encoding=None if 'b' in mode else 'utf8')
 
-    def add_image(self, image_path):
-        self.images.add(image_path)
+    def open_image(self, image_path):
+        if self.staged_images is None:
+            return self.open_file(image_path, mode='wb')
+        path = join(self.odir, image_path)
+        if not isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp = tempfile.mkstemp('.tmp', '.', os.path.dirname(path))
+        self.staged_images[image_path] = (temp, None)
+        return os.fdopen(fd, 'wb')
 
-    def need_image(self, image_path):
-        return image_path not in self.images if self.replace_images else not self.file_exists(image_path)
+    def add_image(self, image_path, digest=None):
+        self.images.add(image_path)
+        if digest:
+            self.image_digests.setdefault(digest, image_path)
+        if self.staged_images and image_path in self.staged_images:
+            self.staged_images[image_path] = (self.staged_images[image_path][0], digest)
+        elif self.incremental:
+            self.hashes[image_path] = self._file_hash(image_path)
+
+    def set_page(self, fname):
+        self.page = fname
+        self.page_images[fname] = []
+
+    def add_page_image(self, image_path):
+        if self.page and image_path not in self.page_images[self.page]:
+            self.page_images[self.page].append(image_path)
+
+    def add_staged_images(self, staged_images):
+        for image_path, (temp, digest) in staged_images.items():
+            if image_path in self.images:
+                os.remove(temp)
+            else:
+                os.replace(temp, join(self.odir, image_path))
+                self.add_image(image_path, digest)
+
+    def need_image(self, image_path, digest=None):
+        if self.replace_images:
+            if digest:
+                self.digests[image_path] = digest
+            return image_path not in self.images
+        if digest and image_path not in self.images:
+            return not (self.is_current(image_path, digest) and self._image_unchanged(image_path))
+        return not self.file_exists(image_path)
+
+    def find_image(self, digest):
+        if digest in self.image_digests:
+            image_path = self.image_digests[digest]
+            if self.staged_images and image_path in self.staged_images:
+                return self.staged_images[image_path][0]
+            return join(self.odir, image_path)
 
     def file_exists(self, fname):
         return isfile(join(self.odir, fname))
 
+    def is_current(self, fname, digest):
+        self.digests[fname] = digest
+        return self.manifest.get(fname) == digest and self.file_exists(fname)
+
+    def is_current_page(self, fname, digest):
+        if self.is_current(fname, digest):
+            return all(self._image_unchanged(i) for i in self.manifest_images.get(fname, ()))
+        return False
+
+    def _image_unchanged(self, image_path):
+        if image_path not in self.hashes:
+            if not self.file_exists(image_path):
+                return False
+            self.hashes[image_path] = self._file_hash(image_path)
+        return self.hashes[image_path] == self.manifest_hashes.get(image_path)
+
+    def _file_hash(self, fname):
+        with open(join(self.odir, fname), 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+
+    def write_manifest(self):
+        if self.incremental:
+            self.manifest.update(self.digests)
+            self.manifest_images.update(self.page_images)
+            self.manifest_hashes.update(self.hashes)
+            contents = {'digests': self.manifest, 'images': self.manifest_images, 'hashes': self.manifest_hashes}
+            with self.open_file(MANIFEST) as f:
+                json.dump(contents, f, sort_keys=True, indent=0)
+
+    def remove_manifest(self):
+        if self.file_exists(MANIFEST):
+            os.remove(join(self.odir, MANIFEST))
+
 class Bytes:
     def __init__(self, values=()):
         self.values = values
@@ -1150,6 +1339,8 @@ class TemplateFormatter:
     """
     def __init__(self, templates):
         self.templates = templates
+        self._compiled = {}
+        self._code = {}
 
     def format_template(self, page_id, name, fields):
         """Format a template.
@@ -1164,14 +1355,23 @@ class TemplateFormatter:
             lines = self._process_include(page_id, lines, fields)
         except SkoolKitError as e:
             raise SkoolKitError("Invalid include directive: {}".format(e.args[0]))
-        try:
-            lines = self._process_foreach(lines, fields)
-        except (skoolmacro.MacroParsingError, NameError, ValueError) as e:
-            raise SkoolKitError("Invalid foreach directive: {}".format(e.args[0]))
-        try:
-            lines = self._process_if(lines, fields)
-        except (SkoolKitError, skoolmacro.MacroParsingError, NameError, ValueError) as e:
-            raise SkoolKitError("Invalid if directive: {}".format(e.args[0]))
+        key = tuple(lines)
+        if key in self._compiled:
+            nodes = self._compiled[key]
+        else:
+            nodes = self._compiled[key] = self._compile(lines)
+        if nodes is None:
+            try:
+                lines = self._process_foreach(lines, fields)
+            except (skoolmacro.MacroParsingError, NameError, ValueError) as e:
+                raise SkoolKitError("Invalid foreach directive: {}".format(e.args[0]))
+            try:
+                lines = self._process_if(lines, fields)
+            except (SkoolKitError, skoolmacro.MacroParsingError, NameError, ValueError) as e:
+                raise SkoolKitError("Invalid if directive: {}".format(e.args[0]))
+        else:
+            lines = []
+            self._render(nodes, fields, dict(fields), (), lines)
         return format_template('\n'.join(lines), tname, **fields)
 
     def _get_template(self, page_id, name):
@@ -1207,6 +1407,106 @@ class TemplateFormatter:
                 return processed
             lines = processed
 
+    def _compile(self, lines):
+        # Parse the 'foreach' and 'if' directives into a tree that can be
+        # rendered repeatedly; return None if the directives are not nested
+        # tidily, in which case the template is processed line by line
+        nodes = []
+        stack = [(None, nodes, None)]
+        loop_vars = []
+        for line in lines:
+            directive = self._html_template_directive(line)
+            kind = stack[-1][0]
+            if directive.startswith('foreach('):
+                try:
+                    varname, seqname = skoolmacro.parse_strings(directive, 7, 2)[1]
+                except skoolmacro.MacroParsingError:
+                    return None
+                if not re.match(r'\$\w+$', varname):
+                    return None
+                body = []
+                stack[-1][1].append((0, seqname, self._compile_expr(seqname, loop_vars), varname, body))
+                stack.append(('for', body, None))
+                loop_vars.append(varname)
+            elif directive == 'endfor' and 'for' in [f[0] for f in stack]:
+                if kind != 'for':
+                    return None
+                stack.pop()
+                loop_vars.pop()
+            elif directive.startswith('if('):
+                try:
+                    expr = skoolmacro.parse_brackets(directive, 2)[1]
+                except skoolmacro.MacroParsingError:
+                    return None
+                node = (1, expr, self._compile_expr(expr, loop_vars), [], [])
+                stack[-1][1].append(node)
+                stack.append(('if', node[3], node))
+            elif directive in ('else', 'endif') and kind in ('if', 'else'):
+                if directive == 'endif':
+                    stack.pop()
+                elif kind == 'if':
+                    node = stack.pop()[2]
+                    stack.append(('else', node[4], node))
+                else:
+                    return None
+            elif directive in ('else', 'endif') and any(f[0] in ('if', 'else') for f in stack):
+                return None
+            else:
+                stack[-1][1].append(line)
+        if len(stack) > 1:
+            return None
+        return nodes
+
+    def _compile_expr(self, expr, loop_vars):
+        if not expr or '{' in expr or '}' in expr:
+            return None
+        for i, varname in enumerate(loop_vars):
+            expr = expr.replace(varname, '_loop_var{}'.format(i))
+        try:
+            return compile(re.sub('\[([^0-9][^]]*)\]', r"['\1']", expr), '<string>', 'eval')
+        except SyntaxError:
+            return None
+
+    def _render(self, nodes, fields, scope, subs, lines):
+        for node in nodes:
+            if isinstance(node, str):
+                for varname, rep in subs:
+                    node = node.replace(varname, rep)
+                lines.append(node)
+            elif node[0] == 0:
+                try:
+                    seqname, seq = self._eval_node_expr(node, fields, scope, subs)
+                    try:
+                        size = len(seq)
+                    except TypeError:
+                        raise ValueError("'{}' is not a list".format(seqname))
+                except (skoolmacro.MacroParsingError, NameError, ValueError) as e:
+                    raise SkoolKitError("Invalid foreach directive: {}".format(e.args[0]))
+                loop_var = '_loop_var{}'.format(len(subs))
+                for i in range(size):
+                    scope[loop_var] = seq[i]
+                    self._render(node[4], fields, scope, subs + ((node[3], '{}[{}]'.format(seqname, i)),), lines)
+            else:
+                try:
+                    value = self._eval_node_expr(node, fields, scope, subs)[1]
+                except (SkoolKitError, skoolmacro.MacroParsingError, NameError, ValueError) as e:
+                    raise SkoolKitError("Invalid if directive: {}".format(e.args[0]))
+                if value:
+                    self._render(node[3], fields, scope, subs, lines)
+                else:
+                    self._render(node[4], fields, scope, subs, lines)
+
+    def _eval_node_expr(self, node, fields, scope, subs):
+        expr, code = node[1:3]
+        for varname, rep in subs:
+            expr = expr.replace(varname, rep)
+        if code:
+            try:
+                return expr, eval(code, None, scope)
+            except KeyError as e:
+                raise SkoolKitError("Unrecognised field '{}'".format(e.args[0]))
+        return expr, self._eval_template_expr(expr, fields)
+
     def _process_foreach(self, lines, fields):
         processed = []
         stack = [processed]
@@ -1264,7 +1564,10 @@ class TemplateFormatter:
     def _eval_template_expr(self, expr, fields):
         if expr:
             try:
-                return eval(re.sub('\[([^0-9][^]]*)\]', r"['\1']", expr.format(**fields)), None, fields)
+                expr_code = re.sub('\[([^0-9][^]]*)\]', r"['\1']", expr.format(**fields))
+                if expr_code not in self._code:
+                    self._code[expr_code] = compile(expr_code, '<string>', 'eval')
+                return eval(self._code[expr_code], None, fields)
             except SyntaxError:
                 raise ValueError("Syntax error in expression: '{}'".format(expr))
             except KeyError as e:
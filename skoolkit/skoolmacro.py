@@ -15,7 +15,7 @@
 # SkoolKit. If not, see <http://www.gnu.org/licenses/>.
 
 from collections import defaultdict
-from functools import partial
+from functools import lru_cache, partial
 import inspect
 import re
 
@@ -25,6 +25,8 @@ from skoolkit.graphics import Udg
 
 _map_cache = {}
 
+_int_params_patterns = {}
+
 _writer = None
 
 _cwd = ()
@@ -117,16 +119,18 @@ def parse_ints(text, index=0, num=0, defaults=(), names=(), fields=None):
             params = _writer.expand(params, *_cwd)
         if fields:
             params = _format_params(params, text[index:end], **fields)
-        return [end] + get_params(params, num, defaults, names, False)
+        return [end] + _get_params(params, num, defaults, names, False)
     if names:
         match = RE_NAMED_PARAMS.match(text, index)
     elif num > 0:
-        pattern = '{0}?(,({0})?){{,{1}}}'.format(PARAM, num - 1)
-        match = re.match(pattern, text[index:])
+        pattern = _int_params_patterns.get(num)
+        if pattern is None:
+            pattern = _int_params_patterns[num] = re.compile('{0}?(,({0})?){{,{1}}}'.format(PARAM, num - 1))
+        match = pattern.match(text, index)
     else:
         return [index]
     params = match.group()
-    return [index + len(params)] + get_params(params, num, defaults, names)
+    return [index + len(params)] + _get_params(params, num, defaults, names)
 
 # API
 def parse_strings(text, index=0, num=0, defaults=()):
@@ -352,6 +356,15 @@ def _parse_image_fname(text, index, fname=''):
             frame = fname
     return end, fname, frame, alt
 
+def _get_params(param_string, num, defaults, names, safe=True):
+    return _get_cached_params(param_string, num, tuple(defaults), tuple(names), safe)
+
+@lru_cache(maxsize=4096)
+def _get_cached_params(param_string, num, defaults, names, safe):
+    # The values of a parameter string (after any macros and replacement
+    # fields have been expanded) depend on nothing else, so memoise them
+    return get_params(param_string, num, defaults, names, safe)
+
 def get_params(param_string, num=0, defaults=(), names=(), safe=True):
     params = []
     named_params = {}
@@ -462,6 +475,9 @@ def expand_macros(writer, text, *cwd):
     if '#' not in text:
         return text
 
+    # The expanded text is collected in 'parts'; the text still to be scanned
+    # is rebuilt only when a macro's replacement itself needs expanding
+    parts = []
     index = 0
     while 1:
         search = RE_MACRO.search(text, index)
@@ -470,24 +486,32 @@ def expand_macros(writer, text, *cwd):
         marker = search.group()
         if marker not in writer.macros:
             raise SkoolParsingError('Found unknown macro: {}'.format(marker))
-        index, start = search.span()
+        start, params = search.span()
+        parts.append(text[index:start])
 
-        while RE_EXPAND.match(text, start):
-            end, expr = parse_strings(text, start + 1, 1)
-            text = text[:start] + expand_macros(writer, expr, *cwd) + text[end:]
+        if RE_EXPAND.match(text, params):
+            text = text[start:]
+            start, params = 0, len(marker)
+            while RE_EXPAND.match(text, params):
+                end, expr = parse_strings(text, params + 1, 1)
+                text = marker + expand_macros(writer, expr, *cwd) + text[end:]
 
         repf = writer.macros[marker]
         try:
-            end, rep = repf(text, start, *cwd)
+            end, rep = repf(text, params, *cwd)
         except UnsupportedMacroError:
             raise SkoolParsingError('Found unsupported macro: {}'.format(marker))
         except MacroParsingError as e:
             raise SkoolParsingError('Error while parsing {} macro: {}'.format(marker, e.args[0]))
-        text = text[:index] + rep + text[abs(end):]
-        if end < 0:
-            index += len(rep)
+        if end < 0 or '#' not in rep or not (rep[-1] == '#' or RE_MACRO.search(rep)):
+            parts.append(rep)
+            index = abs(end)
+        else:
+            text = rep + text[end:]
+            index = 0
 
-    return text
+    parts.append(text[index:])
+    return ''.join(parts)
 
 def parse_call(writer, text, index, *cwd):
     # #CALL:methodName(args)
@@ -15,13 +15,17 @@
 # SkoolKit. If not, see <http://www.gnu.org/licenses/>.
 
 from collections import defaultdict, namedtuple
+import hashlib
 from html import escape
+import os.path
+import pickle
 import re
 
-from skoolkit import (BASE_10, BASE_16, CASE_LOWER, CASE_UPPER, SkoolParsingError,
+from skoolkit import (BASE_10, BASE_16, CASE_LOWER, CASE_UPPER, VERSION, SkoolParsingError,
                       warn, wrap, get_int_param, parse_int, open_file, z80)
-from skoolkit.components import get_assembler, get_instruction_utility
+from skoolkit.components import get_assembler, get_instruction_utility, get_value
 from skoolkit.skoolmacro import INTEGER, ClosingBracketError, MacroParsingError, parse_brackets, parse_if, parse_strings
+from skoolkit.snapshot import Memory
 from skoolkit.textutils import partition_unquoted, split_quoted, split_unquoted
 
 Z80_ASSEMBLER = z80.Assembler()
@@ -415,7 +419,7 @@ class SkoolParser:
     :param variables: List of (name, value) tuples defining variables that are
                       made available in the `vars` dictionary.
     :param fields: Fields to use instead of the initial set.
-    :param snapshot: Base snapshot to use instead of an empty one.
+    :param snapshot: Base snapshot to use (and modify) instead of an empty one.
     :param expands: List of @expand directive values.
     """
     def __init__(self, skoolfile, case=0, base=0, asm_mode=0, warnings=False, fix_mode=0, html=False,
@@ -441,7 +445,7 @@ class SkoolParser:
                 'mode': self.fields.copy(),
                 'vars': defaultdict(int, variables)
             })
-        self.snapshot = snapshot or [0] * 65536  # 64K of Spectrum memory
+        self.snapshot = snapshot or Memory([0] * 65536)  # 64K of Spectrum memory
         self.expands = expands or []
         self._instructions = defaultdict(list)   # address -> [Instructions]
         self._entries = {}                       # address -> SkoolEntry
@@ -454,9 +458,14 @@ class SkoolParser:
         self._replacements = []
         self.equs = []
         self._labels = {}
+        self._warnings = []
 
-        with open_file(skoolfile) as f:
-            self._parse_skool(f, asm_mode, min_address, max_address)
+        cache = self._get_cache_file(skoolfile, asm_mode, min_address, max_address)
+        if not (cache and self._read_cache(cache)):
+            with open_file(skoolfile) as f:
+                self._parse_skool(f, asm_mode, min_address, max_address)
+            if cache:
+                self._write_cache(cache)
 
     def clone(self, skoolfile):
         return SkoolParser(
@@ -470,7 +479,7 @@ class SkoolParser:
             self.mode.create_labels,
             self.mode.asm_labels,
             fields=self.fields,
-            snapshot=self.snapshot[:],
+            snapshot=Memory(self.snapshot),
             expands=self.expands[:]
         )
 
@@ -507,6 +516,124 @@ class SkoolParser:
     def convert_address_operand(self, operand):
         return self.mode.convert_int_str(operand, '{}')
 
+    def _get_cache_file(self, skoolfile, asm_mode, min_address, max_address):
+        cache_dir = get_value('SkoolFileCache')
+        if cache_dir and skoolfile != '-':
+            with open(skoolfile, 'rb') as f:
+                skool_digest = hashlib.sha1(f.read()).hexdigest()
+            mode = self.mode
+            components = [get_value(c) for c in ('Assembler', 'InstructionUtility', 'OperandEvaluator')]
+            key = (VERSION, components, skool_digest, self.case, self.base,
+                   asm_mode, mode.fix_mode, mode.html, mode.create_labels, mode.asm_labels, min_address,
+                   max_address, self.fields, self.snapshot, self.expands)
+            return os.path.join(os.path.expanduser(cache_dir), hashlib.sha1(repr(key).encode('utf-8')).hexdigest())
+
+    def _read_cache(self, cache):
+        if not os.path.isfile(cache):
+            return False
+        try:
+            with open(cache, 'rb') as f:
+                self._set_state(pickle.load(f))
+        except Exception:
+            # The cache file is unreadable, truncated or stale; parse the skool
+            # file instead
+            return False
+        for message in self._warnings:
+            if self.mode.warn:
+                warn(message)
+        return True
+
+    def _set_state(self, state):
+        entries = []
+        for cls, attrs, instructions in state['entries']:
+            entry = cls.__new__(cls)
+            entry.__dict__.update(attrs)
+            entry.instructions = []
+            for i_attrs in instructions:
+                instruction = Instruction.__new__(Instruction)
+                instruction.__dict__.update(i_attrs)
+                instruction.container = entry
+                entry.instructions.append(instruction)
+            entries.append(entry)
+        for entry in entries:
+            entry.referrers = [entries[i] for i in entry.referrers]
+            for instruction in entry.instructions:
+                instruction.referrers = [entries[i] for i in instruction.referrers]
+                if instruction.reference:
+                    e_index, address, addr_str, use_label = instruction.reference
+                    instruction.reference = Reference(entries[e_index], address, addr_str, use_label)
+        instructions = defaultdict(list)
+        for address, locations in state['instructions'].items():
+            instructions[address] = [entries[e].instructions[i] for e, i in locations]
+        self.memory_map = entries[:state['map_size']]
+        self._remote_entries = entries[state['map_size']:]
+        self._entries = {e.address: e for e in self.memory_map}
+        self._instructions = instructions
+        for name in ('expands', 'asm_writer_class', 'properties', 'equs', '_labels', '_replacements'):
+            setattr(self, name, state[name])
+        self.snapshot[:] = state['snapshot']
+        self.mode.__dict__.update(state['mode'])
+        self._warnings = state['warnings']
+
+    def _write_cache(self, cache):
+        try:
+            state = self._get_state()
+        except KeyError:
+            # Some object is not reachable from the memory map or the remote
+            # entries, so the parsed state cannot be reconstructed from it
+            return
+        temp = cache + '.tmp'
+        try:
+            cache_dir = os.path.dirname(cache)
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir, exist_ok=True)
+            with open(temp, 'wb') as f:
+                pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp, cache)
+        except (OSError, pickle.PicklingError, TypeError, AttributeError):
+            # The cache directory is unwritable, the disk is full, or some
+            # object cannot be pickled; carry on without a cache file
+            if os.path.isfile(temp):
+                try:
+                    os.remove(temp)
+                except OSError:
+                    pass
+
+    def _get_state(self):
+        all_entries = self.memory_map + self._remote_entries
+        e_indexes = {id(e): i for i, e in enumerate(all_entries)}
+        i_locations = {}
+        entries = []
+        for e_index, entry in enumerate(all_entries):
+            attrs = entry.__dict__.copy()
+            del attrs['instructions']
+            attrs['referrers'] = [e_indexes[id(e)] for e in entry.referrers]
+            instructions = []
+            for i_index, instruction in enumerate(entry.instructions):
+                i_locations[id(instruction)] = (e_index, i_index)
+                i_attrs = instruction.__dict__.copy()
+                del i_attrs['container']
+                i_attrs['referrers'] = [e_indexes[id(e)] for e in instruction.referrers]
+                if instruction.reference:
+                    ref = instruction.reference
+                    i_attrs['reference'] = (e_indexes[id(ref.entry)], ref.address, ref.addr_str, ref.use_label)
+                instructions.append(i_attrs)
+            entries.append((type(entry), attrs, instructions))
+        return {
+            'entries': entries,
+            'map_size': len(self.memory_map),
+            'instructions': {a: [i_locations[id(i)] for i in v] for a, v in self._instructions.items() if v},
+            'snapshot': list(self.snapshot),
+            'expands': self.expands,
+            'asm_writer_class': self.asm_writer_class,
+            'properties': self.properties,
+            'equs': self.equs,
+            '_labels': self._labels,
+            '_replacements': self._replacements,
+            'mode': {k: v for k, v in self.mode.__dict__.items() if k not in ('assembler', 'warn')},
+            'warnings': self._warnings
+        }
+
     def _parse_skool(self, skoolfile, asm_mode, min_address, max_address):
         address_comments = []
         asm = 2 + int(1 <= asm_mode <= 3)
@@ -754,8 +881,10 @@ class SkoolParser:
                 instruction.html_escape()
 
     def warn(self, message, instruction):
+        message = '{0}:\n  {1.addr_str} {1.operation}'.format(message, instruction)
+        self._warnings.append(message)
         if self.mode.warn:
-            warn('{0}:\n  {1.addr_str} {1.operation}'.format(message, instruction))
+            warn(message)
 
     def _generate_labels(self):
         """Generate labels for mid-routine entry points (based on the label of
@@ -19,14 +19,20 @@ import os
 
 from skoolkit import SkoolKitError, open_file, read_bin_file, write_line, get_address_format
 from skoolkit.ctlparser import CtlParser
-from skoolkit.opcodes import END, decode
+from skoolkit.opcodes import END, DecodeCache, decode
 from skoolkit.skoolctl import AD_ORG, AD_START
 from skoolkit.snaskool import Disassembly
 
+# Executed addresses in a Z80 map file byte (bits 0-7)
+Z80_MAP_BITS = [bytes((b >> i) & 1 for i in range(8)) for b in range(256)]
+
+# Executed address flag in a SpecEmu map file byte (bit 0)
+SPECEMU_MAP_BITS = bytes(b & 1 for b in range(256))
+
 class CodeMapError(SkoolKitError):
     pass
 
-def _get_code_blocks(snapshot, start, end, fname):
+def _get_code_blocks(decoder, start, end, fname):
     if os.path.isdir(fname):
         raise SkoolKitError('{0} is a directory'.format(fname))
     try:
@@ -40,50 +46,42 @@ def _get_code_blocks(snapshot, start, end, fname):
         # Assume this is a Z80 map file
         sys.stderr.write('Reading {0}'.format(fname))
         sys.stderr.flush()
-        addresses = []
-        data = read_bin_file(fname)
-        address = start & 65528
-        for b in data[start // 8:end // 8 + 1]:
-            for i in range(8):
-                if b & 1 and start <= address < end:
-                    addresses.append(address)
-                b >>= 1
-                address += 1
+        code_map = b''.join([Z80_MAP_BITS[b] for b in read_bin_file(fname)])
     elif size == 65536:
         # Assume this is a SpecEmu map file
         sys.stderr.write('Reading {}'.format(fname))
         sys.stderr.flush()
-        addresses = []
-        data = read_bin_file(fname)
-        for address in range(start, end):
-            if data[address] & 1:
-                addresses.append(address)
+        code_map = read_bin_file(fname).translate(SPECEMU_MAP_BITS)
     else:
         sys.stderr.write('Reading {0}: '.format(fname))
         sys.stderr.flush()
-        with open_file(fname) as f:
-            addresses = _get_addresses(f, fname, size, start, end)
+        with open_file(fname, 'rb') as f:
+            code_map = _get_code_map(f, fname, size)
     sys.stderr.write('\n')
 
     code_blocks = []
-    for address in addresses:
-        size = next(decode(snapshot, address, address + 1))[1]
-        if code_blocks and address <= sum(code_blocks[-1]):
-            if address == sum(code_blocks[-1]):
-                code_blocks[-1][1] += size
-        else:
+    block_end = None
+    address = code_map.find(1, start, end)
+    while address >= 0:
+        size = decoder.get(address)[1]
+        if address == block_end:
+            code_blocks[-1][1] += size
+            block_end += size
+        elif block_end is None or address > block_end:
             code_blocks.append([address, size])
+            block_end = address + size
+        address = code_map.find(1, address + 1, end)
 
     return code_blocks
 
-def _get_addresses(f, fname, size, start, end):
-    addresses = set()
+def _get_code_map(f, fname, size):
+    code_map = bytearray(65536)
     base = 16
     i = 1
     rewind = True
     ignore_prefixes = ()
 
-    s_line = ''
+    s_line = b''
     while 1:
         line = f.readline()
         if not line:
@@ -93,22 +91,22 @@ def _get_addresses(f, fname, size, start, end):
         if s_line:
             break
 
-    if s_line.startswith('0x'):
+    if s_line.startswith(b'0x'):
         # Fuse profile
         address_f = lambda s_line: s_line[2:6]
-    elif s_line.startswith('PC = '):
+    elif s_line.startswith(b'PC = '):
         # Spud log
         address_f = lambda s_line: s_line[5:9]
-    elif s_line.startswith('PC:'):
+    elif s_line.startswith(b'PC:'):
         # SpecEmu log
         address_f = lambda s_line: s_line[:4]
-        ignore_prefixes = ('PC:', 'IX:', 'HL:', 'DE:', 'BC:', 'AF:')
+        ignore_prefixes = (b'PC:', b'IX:', b'HL:', b'DE:', b'BC:', b'AF:')
         rewind = False
-    elif s_line.endswith('decimal'):
+    elif s_line.endswith(b'decimal'):
         # Zero log
-        if s_line.endswith('in decimal'):
+        if s_line.endswith(b'in decimal'):
             base = 10
-        address_f = lambda s_line: s_line[:s_line.find('\t')]
+        address_f = lambda s_line: s_line[:s_line.find(b'\t')]
         rewind = False
     else:
         raise CodeMapError('{0}: Unrecognised format'.format(fname))
@@ -117,13 +115,15 @@ def _get_addresses(f, fname, size, start, end):
         f.seek(0)
         i = 1
 
-    while 1:
-        line = f.readline()
-        if not line:
-            break
-        progress_msg = '{0}%'.format((100 * f.tell()) // size)
-        sys.stderr.write(progress_msg + chr(8) * len(progress_msg))
-        sys.stderr.flush()
+    pos = f.tell()
+    progress = -1
+    for line in f:
+        pos += len(line)
+        if 100 * pos // size > progress:
+            progress = 100 * pos // size
+            progress_msg = '{0}%'.format(progress)
+            sys.stderr.write(progress_msg + chr(8) * len(progress_msg))
+            sys.stderr.flush()
         s_line = line.strip()
         if s_line:
             address_str = address_f(s_line)
@@ -133,20 +133,19 @@ def _get_addresses(f, fname, size, start, end):
                     address = int(address_str, base)
                 except ValueError:
                     if not (ignore_prefixes and s_line.startswith(ignore_prefixes)):
-                        raise CodeMapError('{0}, line {1}: Cannot parse address: {2}'.format(fname, i, s_line))
+                        raise CodeMapError('{0}, line {1}: Cannot parse address: {2}'.format(fname, i, s_line.decode('utf-8', 'replace')))
                 if address is not None:
                     if address < 0 or address > 65535:
-                        raise CodeMapError('{0}, line {1}: Address out of range: {2}'.format(fname, i, s_line))
-                    if start <= address < end:
-                        addresses.add(address)
+                        raise CodeMapError('{0}, line {1}: Address out of range: {2}'.format(fname, i, s_line.decode('utf-8', 'replace')))
+                    code_map[address] = 1
         i += 1
 
-    return sorted(addresses)
+    return code_map
 
-def _find_terminal_instruction(snapshot, ctls, start, end, ctl=None):
+def _find_terminal_instruction(decoder, ctls, start, end, ctl=None):
     address = start
     while address < end:
-        i_addr, size, max_count, op_id = next(decode(snapshot, address, address + 1))[:4]
+        i_addr, size, max_count, op_id = decoder.get(address)[:4]
         address += size
         if ctl is None:
             for a in range(i_addr, address):
@@ -187,21 +186,26 @@ def _generate_ctls_with_code_map(snapshot, start, end, config, code_map):
     # (1) Mark all executed blocks as 'c' and unexecuted blocks as 'U'
     # (unknown)
     ctls = {start: 'U', end: 'i'}
-    for address, length in _get_code_blocks(snapshot, start, end, code_map):
+    decoder = DecodeCache(snapshot)
+    for address, length in _get_code_blocks(decoder, start, end, code_map):
         ctls[address] = 'c'
         if address + length < end:
             ctls[address + length] = 'U'
 
     # (2) Where a 'c' block doesn't end with a RET/JP/JR, extend it up to the
     # next RET/JP/JR in the following 'U' blocks, or up to the next 'c' block
+    terminated = set()
     while 1:
         done = True
         for ctl, b_start, b_end in _get_blocks(ctls):
             if ctl == 'c':
-                last_op_id = list(decode(snapshot, b_start, b_end))[-1][3]
+                if (b_start, b_end) in terminated:
+                    continue
+                last_op_id = list(decoder.decode(b_start, b_end))[-1][3]
                 if last_op_id == END:
+                    terminated.add((b_start, b_end))
                     continue
-                if _find_terminal_instruction(snapshot, ctls, b_end, end) < end:
+                if _find_terminal_instruction(decoder, ctls, b_end, end) < end:
                     done = False
                     break
         if done:
@@ -224,7 +228,7 @@ def _generate_ctls_with_code_map(snapshot, start, end, config, code_map):
                                 e_end = entry.next.address
                             else:
                                 e_end = 65536
-                            _find_terminal_instruction(snapshot, ctls, instruction.address, e_end, entry.ctl)
+                            _find_terminal_instruction(decoder, ctls, instruction.address, e_end, entry.ctl)
                             disassembly.remove_entry(entry.address)
                             done = False
                             break
@@ -238,11 +242,11 @@ def _generate_ctls_with_code_map(snapshot, start, end, config, code_map):
     # (4) Split 'c' blocks on RET/JP/JR
     for ctl, b_address, b_end in _get_blocks(ctls):
         if ctl == 'c':
-            next_address = _find_terminal_instruction(snapshot, ctls, b_address, b_end, 'c')
+            next_address = _find_terminal_instruction(decoder, ctls, b_address, b_end, 'c')
             if next_address < b_end:
                 disassembly.remove_entry(b_address)
                 while next_address < b_end:
-                    next_address = _find_terminal_instruction(snapshot, ctls, next_address, b_end, 'c')
+                    next_address = _find_terminal_instruction(decoder, ctls, next_address, b_end, 'c')
 
     # (5) Scan the disassembly for pairs of adjacent blocks where the start
     # address of the second block is JRed or JPed to from the first block, and
@@ -15,9 +15,16 @@
 # SkoolKit. If not, see <http://www.gnu.org/licenses/>.
 
 import argparse
+import glob
+import io
+import json
+import multiprocessing
+import os
+from contextlib import redirect_stdout
 
 from skoolkit import SkoolKitError, get_dword, get_int_param, get_word, integer, read_bin_file, VERSION
 from skoolkit.basic import BasicLister, VariableLister, get_char
+from skoolkit.components import get_snapshot_reader
 from skoolkit.config import get_config, show_config, update_options
 from skoolkit.opcodes import END, decode
 from skoolkit.snapshot import make_snapshot
@@ -409,7 +416,30 @@ def _call_graph(snapshot, ctlfiles, prefix, start, end, config):
             print('{} -> {{{}}}'.format(node_id, ' '.join(ref_ids)))
     print('}')
 
-def _find(snapshot, byte_seq, base_addr=16384):
+class _SnapshotIndex:
+    def __init__(self, snapshot):
+        if isinstance(snapshot, bytearray):
+            self.memory = bytes(snapshot)
+        else:
+            self.memory = bytes(v & 255 for v in snapshot)
+        self.strides = {}
+
+    def find(self, byte_values, step=1, base_addr=16384):
+        if step < 1 or not all(0 <= b < 256 for b in byte_values):
+            return []
+        if step not in self.strides:
+            self.strides[step] = [self.memory[r::step] for r in range(step)]
+        pattern = bytes(byte_values)
+        max_addr = 65536 - step * len(byte_values)
+        addresses = []
+        for r, stride in enumerate(self.strides[step]):
+            i = stride.find(pattern, max(0, (base_addr - r + step - 1) // step))
+            while 0 <= i and r + i * step <= max_addr:
+                addresses.append(r + i * step)
+                i = stride.find(pattern, i + 1)
+        return sorted(addresses)
+
+def _find(index, byte_seq, base_addr=16384):
     steps = '1'
     if '-' in byte_seq:
         byte_seq, steps = byte_seq.split('-', 1)
@@ -427,9 +457,8 @@ def _find(snapshot, byte_seq, base_addr=16384):
         raise SkoolKitError('Invalid distance: {}'.format(steps))
     for step in steps:
         offset = step * len(byte_values)
-        for a in range(base_addr, 65537 - offset):
-            if snapshot[a:a + offset:step] == byte_values:
-                print("{0}-{1}-{2} {0:04X}-{1:04X}-{2:X}: {3}".format(a, a + offset - step, step, byte_seq))
+        for a in index.find(byte_values, step, base_addr):
+            print("{0}-{1}-{2} {0:04X}-{1:04X}-{2:X}: {3}".format(a, a + offset - step, step, byte_seq))
 
 def _find_tile(snapshot, coords):
     steps = '1'
@@ -445,14 +474,19 @@ def _find_tile(snapshot, coords):
     byte_seq = snapshot[df_addr:df_addr + 2048:256]
     for b in byte_seq:
         print('|{:08b}|'.format(b).replace('0', ' ').replace('1', '*'))
-    _find(snapshot, '{}-{}'.format(','.join([str(b) for b in byte_seq]), steps), 23296)
+    _find(_SnapshotIndex(snapshot), '{}-{}'.format(','.join([str(b) for b in byte_seq]), steps), 23296)
 
-def _find_text(snapshot, text):
+def _find_text(index, text):
     size = len(text)
-    byte_values = [ord(c) for c in text]
-    for a in range(16384, 65536 - size + 1):
-        if snapshot[a:a + size] == byte_values:
-            print("{0}-{1} {0:04X}-{1:04X}: {2}".format(a, a + size - 1, text))
+    for a in index.find([ord(c) for c in text]):
+        print("{0}-{1} {0:04X}-{1:04X}: {2}".format(a, a + size - 1, text))
+
+def _search(snapshot, byte_seqs, texts):
+    index = _SnapshotIndex(snapshot)
+    for byte_seq in byte_seqs:
+        _find(index, byte_seq)
+    for text in texts:
+        _find_text(index, text)
 
 def _peek(snapshot, specs):
     for addr1, addr2, step in _get_address_ranges(specs):
@@ -467,16 +501,23 @@ def _word(snapshot, specs):
             value = snapshot[a] + 256 * snapshot[a + 1]
             print('{0:>5} {0:04X}: {1:>5}  {1:04X}'.format(a, value))
 
+def _print_lines(lines):
+    sep = ''
+    for line in lines:
+        print(sep + line, end='')
+        sep = '\n'
+    print()
+
 def run(infile, options, config):
     if any((options.find, options.tile, options.text, options.call_graph, options.peek,
             options.word, options.basic, options.variables)):
         snapshot, start, end = make_snapshot(infile, options.org, page=options.page)
         if options.find:
-            _find(snapshot, options.find)
+            _search(snapshot, options.find, options.text or ())
         elif options.tile:
             _find_tile(snapshot, options.tile)
         elif options.text:
-            _find_text(snapshot, options.text)
+            _search(snapshot, (), options.text)
         elif options.call_graph:
             _call_graph(snapshot, options.ctlfiles, infile, start, end, config)
         elif options.peek:
@@ -485,9 +526,9 @@ def run(infile, options, config):
             _word(snapshot, options.word)
         else:
             if options.basic:
-                print(BasicLister().list_basic(snapshot))
+                _print_lines(BasicLister().get_lines(snapshot))
             if options.variables:
-                print(VariableLister().list_variables(snapshot))
+                _print_lines(VariableLister().get_lines(snapshot))
     else:
         snapshot_type = infile[-4:].lower()
         if snapshot_type == '.sna':
@@ -497,6 +538,44 @@ def run(infile, options, config):
         elif snapshot_type == '.szx':
             _analyse_szx(infile)
 
+def _get_snapshot_files(infile):
+    if os.path.isdir(infile):
+        fnames = [os.path.join(infile, f) for f in os.listdir(infile)]
+    elif os.path.exists(infile):
+        return None
+    else:
+        fnames = glob.glob(infile)
+        if not fnames:
+            return None
+    snapshot_reader = get_snapshot_reader()
+    return sorted(f for f in fnames if os.path.isfile(f) and snapshot_reader.can_read(f))
+
+def _analyse(task):
+    infile, options, config = task
+    result = {'file': infile}
+    output = io.StringIO()
+    try:
+        with redirect_stdout(output):
+            run(infile, options, config)
+    except SkoolKitError as e:
+        result['error'] = e.args[0]
+    except Exception as e:
+        # A truncated or corrupt snapshot may cause an error that is not
+        # caught by the snapshot reader; report it and carry on
+        result['error'] = '{}: {}'.format(type(e).__name__, e)
+    result['output'] = output.getvalue().splitlines()
+    return json.dumps(result)
+
+def _run_batch(infiles, options, config):
+    tasks = [(f, options, config) for f in infiles]
+    if options.jobs > 1:
+        with multiprocessing.Pool(options.jobs) as pool:
+            for result in pool.imap(_analyse, tasks):
+                print(result, flush=True)
+    else:
+        for task in tasks:
+            print(_analyse(task), flush=True)
+
 def main(args):
     config = get_config('snapinfo')
     parser = argparse.ArgumentParser(
@@ -511,12 +590,15 @@ def main(args):
     group.add_argument('-c', '--ctl', dest='ctlfiles', metavar='FILE', action='append', default=[],
                        help="Use FILE as a control file when generating a call graph. FILE may be '-' for standard input. "
                             "This option may be used multiple times.")
-    group.add_argument('-f', '--find', metavar='A[,B...[-M[-N]]]',
-                       help='Search for the byte sequence A,B... with distance ranging from M to N (default=1) between bytes.')
+    group.add_argument('-f', '--find', metavar='A[,B...[-M[-N]]]', action='append',
+                       help='Search for the byte sequence A,B... with distance ranging from M to N (default=1) between bytes. '
+                            'This option may be used multiple times.')
     group.add_argument('-g', '--call-graph', action='store_true',
                        help='Generate a call graph in DOT format.')
     group.add_argument('-I', '--ini', dest='params', metavar='p=v', action='append', default=[],
                        help="Set the value of the configuration parameter 'p' to 'v'. This option may be used multiple times.")
+    group.add_argument('--jobs', dest='jobs', metavar='N', type=int, default=1,
+                       help='Analyse snapshots using N worker processes when FILE is a directory or a glob pattern (default: 1).')
     group.add_argument('-o', '--org', dest='org', metavar='ADDR', type=integer,
                        help='Specify the origin address of a binary (raw memory) file (default: 65536 - length).')
     group.add_argument('-p', '--peek', metavar='A[-B[-C]]', action='append',
@@ -525,8 +607,8 @@ def main(args):
                        help='Specify the page (0-7) of a 128K snapshot to map to 49152-65535.')
     group.add_argument('--show-config', dest='show_config', action='store_true',
                        help="Show configuration parameter values.")
-    group.add_argument('-t', '--find-text', dest='text', metavar='TEXT',
-                       help='Search for a text string.')
+    group.add_argument('-t', '--find-text', dest='text', metavar='TEXT', action='append',
+                       help='Search for a text string. This option may be used multiple times.')
     group.add_argument('-T', '--find-tile', dest='tile', metavar='X,Y[-M[-N]]',
                        help='Search for the graphic data of the tile at (X,Y) with distance ranging from M to N (default=1) between bytes.')
     group.add_argument('-v', '--variables', action='store_true',
@@ -541,4 +623,8 @@ def main(args):
     if unknown_args or namespace.infile is None:
         parser.exit(2, parser.format_help())
     update_options('snapinfo', namespace, namespace.params, config)
-    run(namespace.infile, namespace, config)
+    infiles = _get_snapshot_files(namespace.infile)
+    if infiles is None:
+        run(namespace.infile, namespace, config)
+    else:
+        _run_batch(infiles, namespace, config)
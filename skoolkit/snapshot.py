@@ -52,6 +52,126 @@ Z80_REGISTERS = {
     'pc': 32
 }
 
+class ByteMemory(bytearray):
+    """A bytearray of memory contents that behaves like a list of byte values
+    when sliced, compared or concatenated, so that it may be used wherever a
+    list-based snapshot is expected. Its contents may be saved and restored
+    in the same way as those of a :class:`~skoolkit.snapshot.Memory` object.
+    """
+    def __init__(self, *args):
+        bytearray.__init__(self, *args)
+        self._saved = []
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(bytearray.__getitem__(self, index))
+        return bytearray.__getitem__(self, index)
+
+    def __eq__(self, other):
+        if isinstance(other, list):
+            return list(self) == other
+        return bytearray.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __add__(self, other):
+        if isinstance(other, list):
+            return list(self) + other
+        return bytearray.__add__(self, other)
+
+    def __radd__(self, other):
+        if isinstance(other, list):
+            return other + list(self)
+        return NotImplemented
+
+    def save(self):
+        """Save a copy of the memory contents."""
+        self._saved.append(bytes(self))
+
+    def restore(self):
+        """Restore the most recently saved copy of the memory contents."""
+        bytearray.__setitem__(self, slice(None), self._saved.pop())
+
+    __hash__ = None
+
+def _journal_all(name):
+    def method(self, *args, **kwargs):
+        self._save_all()
+        return getattr(list, name)(self, *args, **kwargs)
+    return method
+
+class Memory(list):
+    """A list of byte values that keeps a stack of journals. While a journal
+    is open, the original value of every address that is modified is
+    recorded in it, so that the modifications can later be undone without
+    having copied the whole list. Shares the
+    :meth:`~skoolkit.snapshot.Memory.save` and
+    :meth:`~skoolkit.snapshot.Memory.restore` interface with
+    :class:`~skoolkit.snapshot.ByteMemory`.
+
+    :param values: The initial byte values.
+    """
+    def __init__(self, values=()):
+        list.__init__(self, values)
+        self._journals = []
+
+    def save(self):
+        """Open a new journal."""
+        self._journals.append({})
+
+    def restore(self):
+        """Undo every modification recorded in the most recently opened
+        journal, and close it."""
+        journal = self._journals.pop()
+        values = journal.pop(None, None)
+        if values is not None:
+            # Restore the whole list before the values of any addresses that
+            # were recorded before it was saved
+            list.__setitem__(self, slice(None), values)
+        for addr, value in journal.items():
+            list.__setitem__(self, addr, value)
+
+    def __reduce__(self):
+        return (Memory, (list(self),))
+
+    def _save_all(self):
+        if self._journals:
+            journal = self._journals[-1]
+            if None not in journal:
+                journal[None] = list(self)
+
+    def __setitem__(self, index, value):
+        if self._journals:
+            journal = self._journals[-1]
+            if None not in journal:
+                if isinstance(index, slice):
+                    indexes = range(*index.indices(len(self)))
+                    value = list(value)
+                    if index.step in (None, 1) and len(value) != len(indexes):
+                        self._save_all()
+                    else:
+                        for i in indexes:
+                            if i not in journal:
+                                journal[i] = list.__getitem__(self, i)
+                else:
+                    i = index + len(self) if index < 0 else index
+                    if i not in journal:
+                        journal[i] = list.__getitem__(self, i)
+        list.__setitem__(self, index, value)
+
+    __delitem__ = _journal_all('__delitem__')
+    __iadd__ = _journal_all('__iadd__')
+    __imul__ = _journal_all('__imul__')
+    append = _journal_all('append')
+    clear = _journal_all('clear')
+    extend = _journal_all('extend')
+    insert = _journal_all('insert')
+    pop = _journal_all('pop')
+    remove = _journal_all('remove')
+    reverse = _journal_all('reverse')
+    sort = _journal_all('sort')
+
 def can_read(fname):
     """
     Return whether this snapshot reader can read the file `fname`.
@@ -79,7 +199,7 @@ def get_snapshot(fname, page=None):
         ram = _read_szx(data, page)
     if len(ram) != 49152:
         raise SnapshotError("RAM size is {0}".format(len(ram)))
-    mem = [0] * 16384
+    mem = ByteMemory(16384)
     mem.extend(ram)
     return mem
 
@@ -90,7 +210,7 @@ def make_snapshot(fname, org, start=0, end=65536, page=None):
     ram = read_bin_file(fname, 65536)
     if org is None:
         org = 65536 - len(ram)
-    mem = [0] * 65536
+    mem = ByteMemory(65536)
     mem[org:org + len(ram)] = ram
     return mem, max(org, start), min(end, org + len(ram))
 
@@ -234,13 +354,13 @@ def poke(snapshot, param_str):
     try:
         if val.startswith('^'):
             value = get_int_param(val[1:], True)
-            poke_f = lambda b: b ^ value
+            poke_f = lambda b: (b ^ value) & 255
         elif val.startswith('+'):
             value = get_int_param(val[1:], True)
             poke_f = lambda b: (b + value) & 255
         else:
             value = get_int_param(val, True)
-            poke_f = lambda b: value
+            poke_f = lambda b: value & 255
     except ValueError:
         raise SkoolKitError('Invalid value in poke spec: {}'.format(param_str))
     try:
@@ -278,7 +398,7 @@ def _read_z80(data, page=None):
     header = data[:header_size]
     if version == 1:
         if header[12] & 32:
-            return _decompress_block(data[header_size:-4])
+            return _decompress_block(data, header_size, len(data) - 4)
         return data[header_size:]
     machine_id = data[34]
     extension = ()
@@ -292,7 +412,7 @@ def _read_z80(data, page=None):
         if page is None:
             page = data[35] & 7
         banks = (5, 2, page) # 128K
-    return _decompress(data[header_size:], banks, extension)
+    return _decompress(data, header_size, banks, extension)
 
 def _read_szx(data, page=None):
     extension = ()
@@ -341,7 +461,7 @@ def _get_zxstblock(data, index, block_id):
     return index, block
 
 def _concatenate_pages(pages, banks, extension):
-    ram = []
+    ram = bytearray()
     for bank in banks:
         if pages[bank] is None:
             raise SnapshotError("Page {0} not found".format(bank))
@@ -349,43 +469,38 @@ def _concatenate_pages(pages, banks, extension):
     ram.extend(extension)
     return ram
 
-def _decompress(ramz, banks, extension):
+def _decompress(data, index, banks, extension):
     pages = {}
     for bank in banks:
         pages[bank] = None
-    j = 0
-    while j < len(ramz):
-        length = ramz[j] + 256 * ramz[j + 1]
-        page = ramz[j + 2] - 3
+    j = index
+    while j < len(data):
+        length = data[j] + 256 * data[j + 1]
+        page = data[j + 2] - 3
         if length == 65535:
             if page in pages:
-                pages[page] = ramz[j + 3:j + 16387]
+                pages[page] = data[j + 3:j + 16387]
             j += 16387
         else:
             if page in pages:
-                pages[page] = _decompress_block(ramz[j + 3:j + 3 + length])
+                pages[page] = _decompress_block(data, j + 3, j + 3 + length)
             j += 3 + length
     return _concatenate_pages(pages, banks, extension)
 
-def _decompress_block(ramz):
-    block = []
-    i = 0
-    while i < len(ramz):
-        b = ramz[i]
-        i += 1
-        if b == 237:
-            c = ramz[i]
-            i += 1
-            if c == 237:
-                length, byte = ramz[i], ramz[i + 1]
-                if length == 0:
-                    raise SnapshotError("Found ED ED 00 {0:02X}".format(byte))
-                block += [byte] * length
-                i += 2
-            else:
-                block += [b, c]
-        else:
-            block.append(b)
+def _decompress_block(data, start, end):
+    block = bytearray()
+    i = start
+    while i < end:
+        j = data.find(b'\xED\xED', i, end)
+        if j < 0:
+            block += data[i:end]
+            break
+        length, byte = data[j + 2], data[j + 3]
+        if length == 0:
+            raise SnapshotError("Found ED ED 00 {0:02X}".format(byte))
+        block += data[i:j]
+        block += bytes((byte,)) * length
+        i = j + 4
     return block
 
 # API (SnapshotReader)
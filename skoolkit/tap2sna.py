@@ -17,14 +17,21 @@
 import sys
 import os
 import argparse
+import glob
+import io
+import json
+import multiprocessing
+import shutil
 import tempfile
+import time
 import zipfile
+from contextlib import redirect_stdout
 from urllib.request import Request, urlopen
 from urllib.parse import urlparse
 
-from skoolkit import (SkoolKitError, get_dword, get_int_param, get_word,
-                      get_word3, integer, open_file, write_line, VERSION)
-from skoolkit.snapshot import move, poke, print_reg_help, print_state_help, write_z80v3
+from skoolkit import SkoolKitError, get_int_param, integer, open_file, write_line, VERSION
+from skoolkit.snapshot import ByteMemory, move, poke, print_reg_help, print_state_help, write_z80v3
+from skoolkit.tape import TapeBlocks, TapeError
 
 class SkoolKitArgumentParser(argparse.ArgumentParser):
     def convert_arg_line_to_args(self, arg_line):
@@ -33,9 +40,6 @@ class SkoolKitArgumentParser(argparse.ArgumentParser):
                 break
             yield arg
 
-class TapeError(Exception):
-    pass
-
 def _write_z80(ram, options, fname):
     parent_dir = os.path.dirname(fname)
     if parent_dir and not os.path.isdir(parent_dir):
@@ -66,6 +70,12 @@ def _load_block(snapshot, block, start, length=None, step=None, offset=None, inc
         offset = 0
     if inc is None:
         inc = 0
+    size = len(data)
+    addr = (start + offset) & 65535
+    if step == 1 and 0 <= start and start + size <= 65536 and addr + size <= 65536:
+        # Contiguous load (no striding or wrapping)
+        snapshot[addr:addr + size] = data
+        return size
     i = start
     for b in data:
         snapshot[(i + offset) & 65535] = b
@@ -100,7 +110,7 @@ def _load(snapshot, counters, blocks, param_str):
     counters[block_num] += length
 
 def _get_ram(blocks, options):
-    snapshot = [0] * 65536
+    snapshot = ByteMemory(65536)
 
     operations = []
     standard_load = True
@@ -144,121 +154,8 @@ def _get_ram(blocks, options):
 
     return snapshot[16384:]
 
-def _get_tzx_block(data, i):
-    # http://www.worldofspectrum.org/TZXformat.html
-    block_id = data[i]
-    tape_data = None
-    i += 1
-    if block_id == 16:
-        # Standard speed data block
-        length = get_word(data, i + 2)
-        tape_data = data[i + 4:i + 4 + length]
-        i += 4 + length
-    elif block_id == 17:
-        # Turbo speed data block
-        length = get_word3(data, i + 15)
-        tape_data = data[i + 18:i + 18 + length]
-        i += 18 + length
-    elif block_id == 18:
-        # Pure tone
-        i += 4
-    elif block_id == 19:
-        # Sequence of pulses of various lengths
-        i += 2 * data[i] + 1
-    elif block_id == 20:
-        # Pure data block
-        length = get_word3(data, i + 7)
-        tape_data = data[i + 10:i + 10 + length]
-        i += 10 + length
-    elif block_id == 21:
-        # Direct recording block
-        i += get_word3(data, i + 5) + 8
-    elif block_id == 24:
-        # CSW recording block
-        i += get_dword(data, i) + 4
-    elif block_id == 25:
-        # Generalized data block
-        i += get_dword(data, i) + 4
-    elif block_id == 32:
-        # Pause (silence) or 'Stop the tape' command
-        i += 2
-    elif block_id == 33:
-        # Group start
-        i += data[i] + 1
-    elif block_id == 34:
-        # Group end
-        pass
-    elif block_id == 35:
-        # Jump to block
-        i += 2
-    elif block_id == 36:
-        # Loop start
-        i += 2
-    elif block_id == 37:
-        # Loop end
-        pass
-    elif block_id == 38:
-        # Call sequence
-        i += get_word(data, i) * 2 + 2
-    elif block_id == 39:
-        # Return from sequence
-        pass
-    elif block_id == 40:
-        # Select block
-        i += get_word(data, i) + 2
-    elif block_id == 42:
-        # Stop the tape if in 48K mode
-        i += 4
-    elif block_id == 43:
-        # Set signal level
-        i += 5
-    elif block_id == 48:
-        # Text description
-        i += data[i] + 1
-    elif block_id == 49:
-        # Message block
-        i += data[i + 1] + 2
-    elif block_id == 50:
-        # Archive info
-        i += get_word(data, i) + 2
-    elif block_id == 51:
-        # Hardware type
-        i += data[i] * 3 + 1
-    elif block_id == 53:
-        # Custom info block
-        i += get_dword(data, i + 16) + 20
-    elif block_id == 90:
-        # "Glue" block
-        i += 9
-    else:
-        raise TapeError('Unknown TZX block ID: 0x{:X}'.format(block_id))
-    return i, tape_data
-
-def _get_tzx_blocks(data):
-    signature = ''.join(chr(b) for b in data[:7])
-    if signature != 'ZXTape!':
-        raise TapeError("Not a TZX file")
-    i = 10
-    blocks = []
-    while i < len(data):
-        i, tape_data = _get_tzx_block(data, i)
-        blocks.append(tape_data)
-    return blocks
-
-def _get_tap_blocks(tap):
-    blocks = []
-    i = 0
-    while i < len(tap):
-        block_len = tap[i] + 256 * tap[i + 1]
-        i += 2
-        blocks.append(tap[i:i + block_len])
-        i += block_len
-    return blocks
-
 def _get_tape_blocks(tape_type, tape):
-    if tape_type.lower() == 'tzx':
-        return _get_tzx_blocks(tape)
-    return _get_tap_blocks(tape)
+    return TapeBlocks(tape, tape_type.lower() == 'tzx')
 
 def _get_tape(urlstring, user_agent, member=None):
     url = urlparse(urlstring)
@@ -267,12 +164,7 @@ def _get_tape(urlstring, user_agent, member=None):
         r = Request(urlstring, headers={'User-Agent': user_agent})
         u = urlopen(r, timeout=30)
         f = tempfile.NamedTemporaryFile(prefix='tap2sna-')
-        while 1:
-            data = bytearray(u.read(4096))
-            if data:
-                f.write(data)
-            else:
-                break
+        shutil.copyfileobj(u, f, 65536)
     elif url.path:
         f = open_file(url.path, 'rb')
 
@@ -370,11 +262,99 @@ def make_z80(url, options, z80):
     ram = _get_ram(tape_blocks, options)
     _write_z80(ram, options, z80)
 
+def _convert(url, z80, options):
+    if options.output_dir:
+        z80 = os.path.join(options.output_dir, z80)
+    if options.stack is not None:
+        options.reg.append('sp={}'.format(options.stack))
+    if options.start is not None:
+        options.reg.append('pc={}'.format(options.start))
+    if options.force or not os.path.isfile(z80):
+        try:
+            make_z80(url, options, z80)
+        except Exception as e:
+            raise SkoolKitError("Error while getting snapshot {}: {}".format(os.path.basename(z80), e.args[0] if e.args else e))
+    else:
+        write_line('{0}: file already exists; use -f to overwrite'.format(z80))
+
+def _copy_options(options):
+    return argparse.Namespace(**{k: v[:] if isinstance(v, list) else v for k, v in vars(options).items()})
+
+def _get_z80_name(url):
+    return os.path.splitext(os.path.basename(urlparse(url).path))[0] + '.z80'
+
+def _get_tape_files(infile):
+    if os.path.isdir(infile):
+        fnames = [os.path.join(infile, f) for f in os.listdir(infile)]
+    elif os.path.exists(infile) or urlparse(infile).scheme:
+        return None
+    else:
+        fnames = glob.glob(infile)
+        if not fnames:
+            return None
+    return sorted(f for f in fnames if os.path.isfile(f) and f.lower().endswith(('.tap', '.tzx', '.zip')))
+
+def _read_manifest(parser, fname, options):
+    tasks = []
+    with open_file(fname) as f:
+        for line in f:
+            args = list(parser.convert_arg_line_to_args(line))
+            if args:
+                task_options = _copy_options(options)
+                task_options.jobs = task_options.manifest = None
+                task_options, unknown_args = parser.parse_known_args(args, task_options)
+                if unknown_args or not 1 <= len(task_options.args) <= 2:
+                    raise SkoolKitError('Invalid line in manifest {}: {}'.format(fname, line.strip()))
+                if task_options.jobs is not None or task_options.manifest is not None:
+                    raise SkoolKitError('--jobs and --manifest cannot be used in manifest {}: {}'.format(fname, line.strip()))
+                task_options.jobs, task_options.manifest = options.jobs, options.manifest
+                url = task_options.args[0]
+                if len(task_options.args) == 2:
+                    z80 = task_options.args[1]
+                else:
+                    z80 = _get_z80_name(url)
+                tasks.append((url, z80, task_options))
+    return tasks
+
+def _check_outputs(tasks):
+    outputs = {}
+    for url, z80, options in tasks:
+        if options.output_dir:
+            z80 = os.path.join(options.output_dir, z80)
+        key = os.path.normcase(os.path.abspath(z80))
+        if key in outputs:
+            raise SkoolKitError('{} and {} would both be written to {}'.format(outputs[key], url, z80))
+        outputs[key] = url
+
+def _convert_task(task):
+    url, z80, options = task
+    result = {'tape': url, 'snapshot': z80}
+    output = io.StringIO()
+    start = time.time()
+    try:
+        with redirect_stdout(output):
+            _convert(url, z80, options)
+    except SkoolKitError as e:
+        result['error'] = e.args[0]
+    result['time'] = round(time.time() - start, 3)
+    result['output'] = output.getvalue().splitlines()
+    return json.dumps(result)
+
+def _run_batch(tasks, jobs):
+    if jobs > 1:
+        with multiprocessing.Pool(jobs) as pool:
+            for result in pool.imap(_convert_task, tasks):
+                print(result, flush=True)
+    else:
+        for task in tasks:
+            print(_convert_task(task), flush=True)
+
 def main(args):
     parser = SkoolKitArgumentParser(
-        usage='\n  tap2sna.py [options] INPUT snapshot.z80\n  tap2sna.py @FILE',
+        usage='\n  tap2sna.py [options] INPUT snapshot.z80\n  tap2sna.py [options] DIR\n  tap2sna.py [options] --manifest FILE\n  tap2sna.py @FILE',
         description="Convert a TAP or TZX file (which may be inside a zip archive) into a Z80 snapshot. "
                     "INPUT may be the full URL to a remote zip archive or TAP/TZX file, or the path to a local file. "
+                    "DIR may be a directory or a glob pattern, in which case every TAP, TZX and zip file in it is converted. "
                     "Arguments may be read from FILE instead of (or as well as) being given on the command line.",
         fromfile_prefix_chars='@',
         add_help=False
@@ -385,6 +365,10 @@ def main(args):
                        help="Write the snapshot file in this directory.")
     group.add_argument('-f', '--force', action='store_true',
                        help="Overwrite an existing snapshot.")
+    group.add_argument('--jobs', dest='jobs', metavar='N', type=int, default=1,
+                       help='Convert tapes using N worker processes in batch mode (default: 1).')
+    group.add_argument('--manifest', dest='manifest', metavar='FILE',
+                       help="Convert the tapes listed in FILE, one set of arguments per line.")
     group.add_argument('-p', '--stack', dest='stack', metavar='STACK', type=integer,
                        help="Set the stack pointer.")
     group.add_argument('--ram', dest='ram_ops', metavar='OPERATION', action='append', default=[],
@@ -412,19 +396,19 @@ def main(args):
     if 'help' in namespace.state:
         print_state_help()
         return
-    if unknown_args or len(namespace.args) != 2:
+    if unknown_args or (namespace.manifest and namespace.args):
         parser.exit(2, parser.format_help())
-    url, z80 = namespace.args
-    if namespace.output_dir:
-        z80 = os.path.join(namespace.output_dir, z80)
-    if namespace.stack is not None:
-        namespace.reg.append('sp={}'.format(namespace.stack))
-    if namespace.start is not None:
-        namespace.reg.append('pc={}'.format(namespace.start))
-    if namespace.force or not os.path.isfile(z80):
-        try:
-            make_z80(url, namespace, z80)
-        except Exception as e:
-            raise SkoolKitError("Error while getting snapshot {}: {}".format(os.path.basename(z80), e.args[0] if e.args else e))
+    if len(namespace.args) == 2:
+        _convert(*namespace.args, namespace)
+        return
+    if namespace.manifest:
+        tasks = _read_manifest(parser, namespace.manifest, namespace)
     else:
-        write_line('{0}: file already exists; use -f to overwrite'.format(z80))
+        tapes = None
+        if len(namespace.args) == 1:
+            tapes = _get_tape_files(namespace.args[0])
+        if tapes is None:
+            parser.exit(2, parser.format_help())
+        tasks = [(t, _get_z80_name(t), _copy_options(namespace)) for t in tapes]
+    _check_outputs(tasks)
+    _run_batch(tasks, namespace.jobs)
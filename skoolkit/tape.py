@@ -0,0 +1,174 @@
+# Copyright 2020 Richard Dymond (rjdymond@gmail.com)
+#
+# This file is part of SkoolKit.
+#
+# SkoolKit is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# SkoolKit is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# SkoolKit. If not, see <http://www.gnu.org/licenses/>.
+
+from skoolkit import get_dword, get_word, get_word3
+
+class TapeError(Exception):
+    pass
+
+def _get_tzx_block(data, i):
+    # http://www.worldofspectrum.org/TZXformat.html
+    block_id = data[i]
+    start = length = None
+    i += 1
+    if block_id == 16:
+        # Standard speed data block
+        start, length = i + 4, get_word(data, i + 2)
+        i += 4 + length
+    elif block_id == 17:
+        # Turbo speed data block
+        start, length = i + 18, get_word3(data, i + 15)
+        i += 18 + length
+    elif block_id == 18:
+        # Pure tone
+        i += 4
+    elif block_id == 19:
+        # Sequence of pulses of various lengths
+        i += 2 * data[i] + 1
+    elif block_id == 20:
+        # Pure data block
+        start, length = i + 10, get_word3(data, i + 7)
+        i += 10 + length
+    elif block_id == 21:
+        # Direct recording block
+        i += get_word3(data, i + 5) + 8
+    elif block_id == 24:
+        # CSW recording block
+        i += get_dword(data, i) + 4
+    elif block_id == 25:
+        # Generalized data block
+        i += get_dword(data, i) + 4
+    elif block_id == 32:
+        # Pause (silence) or 'Stop the tape' command
+        i += 2
+    elif block_id == 33:
+        # Group start
+        i += data[i] + 1
+    elif block_id == 34:
+        # Group end
+        pass
+    elif block_id == 35:
+        # Jump to block
+        i += 2
+    elif block_id == 36:
+        # Loop start
+        i += 2
+    elif block_id == 37:
+        # Loop end
+        pass
+    elif block_id == 38:
+        # Call sequence
+        i += get_word(data, i) * 2 + 2
+    elif block_id == 39:
+        # Return from sequence
+        pass
+    elif block_id == 40:
+        # Select block
+        i += get_word(data, i) + 2
+    elif block_id == 42:
+        # Stop the tape if in 48K mode
+        i += 4
+    elif block_id == 43:
+        # Set signal level
+        i += 5
+    elif block_id == 48:
+        # Text description
+        i += data[i] + 1
+    elif block_id == 49:
+        # Message block
+        i += data[i + 1] + 2
+    elif block_id == 50:
+        # Archive info
+        i += get_word(data, i) + 2
+    elif block_id == 51:
+        # Hardware type
+        i += data[i] * 3 + 1
+    elif block_id == 53:
+        # Custom info block
+        i += get_dword(data, i + 16) + 20
+    elif block_id == 90:
+        # "Glue" block
+        i += 9
+    else:
+        raise TapeError('Unknown TZX block ID: 0x{:X}'.format(block_id))
+    return i, block_id, start, length
+
+def _get_tap_block(data, i):
+    length = data[i] + 256 * data[i + 1]
+    return i + 2 + length, None, i + 2, length
+
+class TapeBlocks:
+    """The blocks of a TAP or TZX file.
+
+    The blocks are indexed - by recording the ID (TZX only) of each block and
+    the offset and length of its data - in a single pass over the tape, as far
+    as is needed to reach the block requested. The data of a block is returned
+    as a memoryview slice of the tape, and is not copied.
+
+    :param tape: The contents of the tape file.
+    :param tzx: Whether the tape is a TZX file.
+    """
+    def __init__(self, tape, tzx=False):
+        self.tape = memoryview(tape)
+        self.index = []
+        if tzx:
+            if self.tape[:7] != b'ZXTape!':
+                raise TapeError("Not a TZX file")
+            self.offset = 10
+            self._get_block = _get_tzx_block
+        else:
+            self.offset = 0
+            self._get_block = _get_tap_block
+
+    def _index_to(self, num):
+        while len(self.index) <= num and self.offset < len(self.tape):
+            offset = self.offset
+            self.offset, block_id, start, length = self._get_block(self.tape, offset)
+            self.index.append((block_id, offset, start, length))
+
+    def _get_data(self, start, length):
+        if start is not None:
+            return self.tape[start:start + length]
+
+    def __len__(self):
+        self._index_to(len(self.tape))
+        return len(self.index)
+
+    def __getitem__(self, num):
+        if num < 0:
+            num += len(self)
+        self._index_to(num)
+        if 0 <= num < len(self.index):
+            return self._get_data(*self.index[num][2:])
+        raise IndexError('block index out of range')
+
+    def __iter__(self):
+        for block_id, offset, data in self.blocks():
+            yield data
+
+    def blocks(self):
+        """Generate the ID (or `None` for a TAP block), offset and data (or
+        `None` if there is no data) of each block on the tape, indexing the
+        blocks one at a time as they are reached.
+        """
+        num = 0
+        while True:
+            self._index_to(num)
+            if num == len(self.index):
+                break
+            block_id, offset, start, length = self.index[num]
+            yield block_id, offset, self._get_data(start, length)
+            num += 1
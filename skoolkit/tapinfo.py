@@ -16,8 +16,9 @@
 
 import argparse
 
-from skoolkit import SkoolKitError, get_word, get_word3, get_dword, get_int_param, VERSION
+from skoolkit import SkoolKitError, get_word, get_dword, get_int_param, VERSION
 from skoolkit.basic import BasicLister, get_char
+from skoolkit.tape import TapeBlocks, TapeError
 
 ARCHIVE_INFO = {
     0: "Full title",
@@ -258,48 +259,32 @@ def _get_block_info(data, i, block_num):
     # http://www.worldofspectrum.org/TZXformat.html
     block_id = data[i]
     info = []
-    tape_data = []
     i += 1
     if block_id == 16:
         header = 'Standard speed data'
-        length = get_word(data, i + 2)
-        tape_data = data[i + 4:i + 4 + length]
-        i += 4 + length
     elif block_id == 17:
         header = 'Turbo speed data'
-        length = get_word3(data, i + 15)
-        tape_data = data[i + 18:i + 18 + length]
-        i += 18 + length
     elif block_id == 18:
         header = 'Pure tone'
         info.append('Pulse length: {} T-states'.format(get_word(data, i)))
         info.append('Pulses: {}'.format(get_word(data, i + 2)))
-        i += 4
     elif block_id == 19:
         header = 'Pulse sequence'
         num_pulses = data[i]
-        i += 1
         for pulse in range(num_pulses):
-            info.append('Pulse {}/{}: {}'.format(pulse + 1, num_pulses, get_word(data, i)))
-            i += 2
+            info.append('Pulse {}/{}: {}'.format(pulse + 1, num_pulses, get_word(data, i + 1 + 2 * pulse)))
     elif block_id == 20:
         header = 'Pure data'
         info.append('0-pulse: {}'.format(get_word(data, i)))
         info.append('1-pulse: {}'.format(get_word(data, i + 2)))
         info.append('Used bits in last byte: {}'.format(data[i + 4]))
         info.append('Pause: {}ms'.format(get_word(data, i + 5)))
-        length = get_word3(data, i + 7)
-        tape_data = data[i + 10:i + 10 + length]
-        i += length + 10
     elif block_id == 21:
         header = 'Direct recording'
-        i += get_word3(data, i + 5) + 8
     elif block_id == 24:
         header = 'CSW recording'
-        i += get_dword(data, i) + 4
     elif block_id == 25:
         header = 'Generalized data'
-        i += get_dword(data, i) + 4
     elif block_id == 32:
         duration = get_word(data, i)
         if duration:
@@ -307,12 +292,9 @@ def _get_block_info(data, i, block_num):
             info.append('Duration: {}ms'.format(duration))
         else:
             header = "'Stop the tape' command"
-        i += 2
     elif block_id == 33:
         header = 'Group start'
-        length = data[i]
-        info.extend(_format_text('Name', data, i + 1, length))
-        i += length + 1
+        info.extend(_format_text('Name', data, i + 1, data[i]))
     elif block_id == 34:
         header = 'Group end'
     elif block_id == 35:
@@ -321,16 +303,13 @@ def _get_block_info(data, i, block_num):
         if offset > 32767:
             offset -= 65536
         info.append('Destination block: {}'.format(block_num + offset))
-        i += 2
     elif block_id == 36:
         header = 'Loop start'
         info.append('Repetitions: {}'.format(get_word(data, i)))
-        i += 2
     elif block_id == 37:
         header = 'Loop end'
     elif block_id == 38:
         header = 'Call sequence'
-        i += get_word(data, i) * 2 + 2
     elif block_id == 39:
         header = 'Return from sequence'
     elif block_id == 40:
@@ -342,23 +321,16 @@ def _get_block_info(data, i, block_num):
             prefix = 'Option {} (block {})'.format(j + 1, block_num + offset)
             info.extend(_format_text(prefix, data, index + 3, length))
             index += length + 3
-        i += get_word(data, i) + 2
     elif block_id == 42:
         header = 'Stop the tape if in 48K mode'
-        i += 4
     elif block_id == 43:
         header = 'Set signal level'
-        i += 5
     elif block_id == 48:
         header = 'Text description'
-        length = data[i]
-        info.extend(_format_text('Text', data, i + 1, length))
-        i += length + 1
+        info.extend(_format_text('Text', data, i + 1, data[i]))
     elif block_id == 49:
         header = 'Message'
-        length = data[i + 1]
-        info.extend(_format_text('Message', data, i + 2, length))
-        i += length + 2
+        info.extend(_format_text('Message', data, i + 2, data[i + 1]))
     elif block_id == 50:
         header = 'Archive info'
         num_strings = data[i + 2]
@@ -370,35 +342,29 @@ def _get_block_info(data, i, block_num):
                 raise SkoolKitError('Unexpected end of file')
             info.extend(_format_text(ARCHIVE_INFO.get(data[j], str(data[j])), data, j + 2, str_len))
             j += 2 + str_len
-        i += get_word(data, i) + 2
     elif block_id == 51:
         header = 'Hardware type'
-        i += 1
-        for j in range(data[i - 1]):
-            hw_type, hw_ids = HARDWARE_TYPE.get(data[i], ('Unknown', {}))
+        for j in range(i + 1, i + 1 + data[i] * 3, 3):
+            hw_type, hw_ids = HARDWARE_TYPE.get(data[j], ('Unknown', {}))
             info.extend((
                 '- Type: {}'.format(hw_type),
-                '  Name: {}'.format(hw_ids.get(data[i + 1], 'Unknown')),
-                '  Info: {}'.format(HARDWARE_INFO[data[i] > 0].get(data[i + 2], 'Unknown'))
+                '  Name: {}'.format(hw_ids.get(data[j + 1], 'Unknown')),
+                '  Info: {}'.format(HARDWARE_INFO[data[j] > 0].get(data[j + 2], 'Unknown'))
             ))
-            i += 3
     elif block_id == 53:
         header = 'Custom info'
         ident = _get_str(data[i:i + 16]).strip()
-        length = get_dword(data, i + 16)
-        info.extend(_format_text(ident, data, i + 20, length, True))
-        i += length + 20
+        info.extend(_format_text(ident, data, i + 20, get_dword(data, i + 16), True))
     elif block_id == 90:
         header = '"Glue" block'
-        i += 9
     else:
         raise SkoolKitError('Unknown block ID: 0x{:02X}'.format(block_id))
-    return i, block_id, header, info, tape_data
+    return block_id, header, info
 
 def _print_info(text):
     print('  ' + text)
 
-def _print_block(index, data, info=(), block_id=None, header=None):
+def _print_block(index, data, block_id=None, header=None, info=()):
     if block_id is None:
         print("{}:".format(index))
     else:
@@ -441,7 +407,7 @@ def _print_block(index, data, info=(), block_id=None, header=None):
 
 def _list_basic(cur_block_num, data, block_num, address):
     if block_num == cur_block_num:
-        snapshot = [0] * address + list(data[1:-1])
+        snapshot = [0] * address + list(data[1:-1] if data else ())
         print(BasicLister().list_basic(snapshot))
 
 def _get_basic_block(spec):
@@ -473,28 +439,22 @@ def _analyse_tzx(tzx, basic_block, options):
             except ValueError:
                 block_ids.add(-1)
 
-    block_num = 1
-    i = 10
-    while i < len(tzx):
-        i, block_id, header, info, tape_data = _get_block_info(tzx, i, block_num)
-        if basic_block:
-            _list_basic(block_num, tape_data, *basic_block)
-        elif not block_ids or block_id in block_ids:
-            _print_block(block_num, tape_data, info, block_id, header)
-        block_num += 1
+    tape = TapeBlocks(tzx, True)
+    try:
+        for block_num, (block_id, offset, tape_data) in enumerate(tape.blocks(), 1):
+            if basic_block:
+                _list_basic(block_num, tape_data, *basic_block)
+            elif not block_ids or block_id in block_ids:
+                _print_block(block_num, tape_data, *_get_block_info(tzx, offset, block_num))
+    except TapeError:
+        raise SkoolKitError('Unknown block ID: 0x{:02X}'.format(tzx[tape.offset]))
 
 def _analyse_tap(tap, basic_block):
-    i = 0
-    block_num = 1
-    while i < len(tap):
-        block_len = get_word(tap, i)
-        data = tap[i + 2:i + 2 + block_len]
+    for block_num, data in enumerate(TapeBlocks(tap), 1):
         if basic_block:
             _list_basic(block_num, data, *basic_block)
         else:
             _print_block(block_num, data)
-        i += block_len + 2
-        block_num += 1
 
 def main(args):
     parser = argparse.ArgumentParser(
@@ -344,6 +344,12 @@ class CommonSkoolMacroTest:
         writer.fields.update({'two': 2, 'three': 3})
         self.assertEqual(writer.expand('#FOR({vars[one]},{three},{two})(n,[n])'), '[1][3]')
 
+    def test_macro_for_output_continued_by_following_text(self):
+        writer = self._get_writer()
+        self.assertEqual(writer.expand('#FOR1,1(n,#)N2'), '2')
+        self.assertEqual(writer.expand('#FOR1,1(n,#N)3'), '3')
+        self.assertEqual(writer.expand('#FOR1,2(n,n#N)3'), '123')
+
     def test_macro_for_with_separator(self):
         writer = self._get_writer()
 
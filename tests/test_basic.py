@@ -8,6 +8,18 @@ class BasicListerTest(SkoolKitTestCase):
         basic = BasicLister().list_basic(snapshot)
         self.assertEqual(exp_output, basic.split('\n'))
 
+    def test_get_lines(self):
+        basic = [
+            0, 10, 2, 0, 251, 13, # 10 CLS
+            0, 20, 2, 0, 226, 13, # 20 STOP
+            128                   # End of BASIC area
+        ]
+        snapshot = [0] * 23755 + basic
+        snapshot[23635:23637] = (203, 92)
+        lines = BasicLister().get_lines(snapshot)
+        self.assertEqual(next(lines), '  10 CLS ')
+        self.assertEqual(list(lines), ['  20 STOP '])
+
     def test_no_program(self):
         basic = [128]
         exp_output = ['']
@@ -355,6 +367,18 @@ class VariableListerTest(SkoolKitTestCase):
         variables = VariableLister().list_variables(snapshot)
         self.assertEqual(exp_output, variables.split('\n'))
 
+    def test_get_lines(self):
+        variables = [
+            97, 0, 0, 1, 0, 0, # Number variable "a"
+            98, 0, 0, 2, 0, 0, # Number variable "b"
+            128                # End of variables
+        ]
+        snapshot = [0] * 23755 + variables
+        snapshot[23627:23629] = (203, 92)
+        lines = VariableLister().get_lines(snapshot)
+        self.assertEqual(next(lines), 'a=1')
+        self.assertEqual(list(lines), ['b=2'])
+
     def test_no_variables(self):
         variables = [128]
         exp_output = ['']
@@ -455,6 +479,20 @@ class VariableListerTest(SkoolKitTestCase):
         ]
         self._test_variables(variables, exp_output)
 
+    def test_number_array_with_floating_point_values(self):
+        variables = [
+            129,                     # Number array variable "a"
+            18, 0,                   # Length
+            1,                       # 1 dimension
+            3, 0,                    # Dimension 1, length 3
+            129, 64, 0, 0, 0,        # a(1)=1.5
+            125, 204, 204, 204, 205, # a(2)=-0.1
+            0, 0, 7, 0, 0,           # a(3)=7
+            128                      # End of variables
+        ]
+        exp_output = ['a(3)=[1.5, -0.10000000000582077, 7]']
+        self._test_variables(variables, exp_output)
+
     def test_character_arrays(self):
         variables = [
             196,   # Character array variable "d$"
@@ -2086,6 +2086,36 @@ class DisassemblerTest(SkoolKitTestCase):
             self.assertEqual(instruction[0], address)
             self.assertEqual(instruction[1], operation)
 
+    def test_disassemble_same_range_in_different_bases(self):
+        snapshot = [
+            62, 10,          # 00000 LD A,10
+            33, 255, 0,      # 00002 LD HL,255
+            221, 54, 1, 16,  # 00005 LD (IX+1),16
+            24, 253,         # 00009 JR 8
+        ]
+        disassembler = self._get_disassembler(snapshot)
+        exp_operations = {
+            'd': ['LD A,10', 'LD HL,255', 'LD (IX+1),16', 'JR 8'],
+            'h': ['LD A,$0A', 'LD HL,$00FF', 'LD (IX+$01),$10', 'JR $0008'],
+            'b': ['LD A,%00001010', 'LD HL,%0000000011111111', 'LD (IX+%00000001),%00010000', 'JR %0000000000001000']
+        }
+        for i in range(2):
+            for base, operations in exp_operations.items():
+                instructions = disassembler.disassemble(0, 11, base)
+                self.assertEqual(operations, [i[1] for i in instructions])
+
+    def test_custom_decoder(self):
+        class CustomDisassembler(Disassembler):
+            def ld_a(self, template, a, base):
+                return template.format(self.snapshot[a + 1] * 2), 2
+            ops = dict(Disassembler.ops)
+            ops[0x3E] = (ld_a, 'LD A,{}')
+
+        snapshot = [62, 5, 0, 62, 6]
+        config = Config(False, False, 8, 66, 1)
+        instructions = CustomDisassembler(snapshot, config).disassemble(0, 5, 'n')
+        self.assertEqual(['LD A,10', 'NOP', 'LD A,12'], [i[1] for i in instructions])
+
     def test_lower_case_conversion_of_defb_statement(self):
         snapshot = [65, 255]
         disassembler = self._get_disassembler(snapshot, asm_lower=True)
@@ -44,6 +44,17 @@ class UdgTest(SkoolKitTestCase):
         self.assertEqual(udg.data, [170, 102, 30, 1, 0, 0, 0, 0])
         self.assertEqual(udg.mask, [170, 204, 240, 255, 255, 255, 255, 255])
 
+    def test_rotate_asymmetric(self):
+        udg = Udg(0, [255, 1, 1, 1, 1, 1, 1, 1], [128, 64, 0, 0, 0, 0, 0, 3])
+        udg.rotate(1)
+        self.assertEqual(udg.data, [1, 1, 1, 1, 1, 1, 1, 255])
+        self.assertEqual(udg.mask, [1, 2, 0, 0, 0, 0, 128, 128])
+
+        udg = Udg(0, [255, 1, 1, 1, 1, 1, 1, 1], [128, 64, 0, 0, 0, 0, 0, 3])
+        udg.rotate(3)
+        self.assertEqual(udg.data, [255, 128, 128, 128, 128, 128, 128, 128])
+        self.assertEqual(udg.mask, [1, 1, 0, 0, 0, 0, 64, 128])
+
     def test_copy(self):
         udg = Udg(23, [1] * 8)
         replica = udg.copy()
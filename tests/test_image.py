@@ -2,8 +2,9 @@ import zlib
 from io import BytesIO
 
 from skoolkittest import SkoolKitTestCase
-from skoolkit.image import (ImageWriter, PNG_COMPRESSION_LEVEL,
-                            PNG_ENABLE_ANIMATION, PNG_ALPHA)
+from skoolkit.image import (ImageWriter, PNG_ADAPTIVE_COMPRESSION,
+                            PNG_COMPRESSION_LEVEL, PNG_ENABLE_ANIMATION,
+                            PNG_ALPHA)
 from skoolkit.graphics import Udg, Frame
 
 TRANSPARENT = [0, 254, 0]
@@ -96,11 +97,30 @@ class ImageWriterOptionsTest(SkoolKitTestCase):
         self.assertEqual(image_writer.options[PNG_COMPRESSION_LEVEL], 9)
         self.assertEqual(image_writer.options[PNG_ENABLE_ANIMATION], 1)
         self.assertEqual(image_writer.options[PNG_ALPHA], 255)
+        self.assertEqual(image_writer.options[PNG_ADAPTIVE_COMPRESSION], 0)
 
     def test_invalid_option_value(self):
         image_writer = ImageWriter(options={PNG_COMPRESSION_LEVEL: 'NaN'})
         self.assertEqual(image_writer.options[PNG_COMPRESSION_LEVEL], 9)
 
+    def _get_zlib_header(self, options, scale):
+        udgs = [[Udg(56, [170, 85] * 4)] * 32] * 24
+        img_stream = BytesIO()
+        ImageWriter(options=options).write_image([Frame(udgs, scale)], img_stream)
+        img_bytes = img_stream.getvalue()
+        index = img_bytes.index(b'IDAT') + 4
+        return img_bytes[index:index + 2]
+
+    def test_adaptive_compression(self):
+        options = {PNG_ADAPTIVE_COMPRESSION: 1}
+        self.assertEqual(self._get_zlib_header(options, 1), b'\x78\xda') # Level 9
+        self.assertEqual(self._get_zlib_header(options, 3), b'\x78\x9c') # Level 6
+        self.assertEqual(self._get_zlib_header({}, 3), b'\x78\xda') # Level 9
+
+    def test_adaptive_compression_with_low_compression_level(self):
+        options = {PNG_ADAPTIVE_COMPRESSION: 1, PNG_COMPRESSION_LEVEL: 1}
+        self.assertEqual(self._get_zlib_header(options, 3), b'\x78\x01') # Level 1
+
 class ImageWriterTest:
     def _get_num(self, stream, index):
         return index + 1, stream[index]
@@ -826,6 +846,63 @@ class ImageWriterTest:
         frames = [frame1, frame2, frame3]
         self._test_animated_image(frames)
 
+    def test_animation_with_many_frames(self):
+        # 20 frames, 2 colours, 16x8
+        frames = [Frame([[Udg(6, (2 ** (i % 8),) * 8), Udg(6, (i,) * 8)]], delay=i + 1) for i in range(20)]
+        self._test_animated_image(frames)
+
+    def test_animation_with_changed_region(self):
+        # 3 frames, 24x16; frame 2 changes only the middle tile of the bottom
+        # row, and frame 3 is identical to frame 2
+        udg1 = Udg(56, (170,) * 8)
+        udg2 = Udg(56, (15,) * 8)
+        frame1 = Frame([[udg1] * 3, [udg1] * 3], delay=10)
+        frame2 = Frame([[udg1] * 3, [udg1, udg2, udg1]], delay=20)
+        frame3 = Frame([[udg1] * 3, [udg1, udg2, udg1]], delay=30)
+        img_bytes = bytes(self._get_animated_image_data(ImageWriter(), [frame1, frame2, frame3]))
+
+        fctls = []
+        fdats = []
+        i = 8
+        while i < len(img_bytes):
+            i, length = self._get_dword(img_bytes, i)
+            chunk_type, data = img_bytes[i:i + 4], img_bytes[i + 4:i + 4 + length]
+            if chunk_type == b'fcTL':
+                fctls.append([self._get_dword(data, j)[1] for j in range(0, 20, 4)] + [data[20] * 256 + data[21]])
+            elif chunk_type == b'fdAT':
+                fdats.append(zlib.decompress(data[4:]))
+            i += length + 8
+
+        exp_fctls = [
+            [0, 24, 16, 0, 0, 10],
+            [1, 8, 8, 8, 8, 20],
+            [3, 8, 8, 0, 0, 30]
+        ]
+        self.assertEqual(exp_fctls, fctls)
+        self.assertEqual(len(fdats[0]), 16)
+        self.assertEqual(len(set(fdats[0][1::2])), 1)
+        self.assertEqual(len(fdats[1]), 16)
+        self.assertEqual(len(set(fdats[1][1::2])), 1)
+        self.assertNotEqual(fdats[0], fdats[1])
+
+    def test_changed_region_of_ragged_frame(self):
+        # Rows of different lengths do not form a rectangle of tiles
+        udg1 = Udg(56, (170,) * 8)
+        udg2 = Udg(56, (15,) * 8)
+        frame1 = Frame([[udg1] * 3, [udg1]])
+        frame2 = Frame([[udg1] * 3, [udg2]])
+        self.assertEqual(ImageWriter().writer._get_changed_region(frame1, frame2), (frame2, 0, 0))
+        frame3 = Frame([[udg1], [udg1] * 3])
+        frame4 = Frame([[udg1], [udg1, udg1, udg2]])
+        self.assertEqual(ImageWriter().writer._get_changed_region(frame3, frame4), (frame4, 0, 0))
+
+    def test_changed_region_of_empty_frame(self):
+        for udgs in ([[]], [[], []]):
+            with self.subTest(udgs=udgs):
+                frame1 = Frame(udgs)
+                frame2 = Frame(udgs)
+                self.assertEqual(ImageWriter().writer._get_changed_region(frame1, frame2), (frame2, 0, 0))
+
     def test_animation_cropped(self):
         # 2 frames, 4 colours, 4x4
         frame1 = Frame([[Udg(56, (128,) * 8)]], x=1, y=1, width=4, height=4)
@@ -0,0 +1,22 @@
+from skoolkittest import SkoolKitTestCase
+from skoolkit.opcodes import END, DecodeCache, decode
+
+class DecodeCacheTest(SkoolKitTestCase):
+    def test_decode(self):
+        snapshot = [0] * 65536
+        snapshot[32768:32775] = (62, 1, 205, 0, 128, 201, 221)
+        cache = DecodeCache(snapshot)
+        exp_instructions = list(decode(snapshot, 32768, 32776))
+        self.assertEqual(exp_instructions, list(cache.decode(32768, 32776)))
+        self.assertEqual(exp_instructions, list(cache.decode(32768, 32776)))
+        self.assertEqual(exp_instructions[2], cache.get(32773))
+        self.assertEqual(END, cache.get(32773)[3])
+
+    def test_instruction_bytes_changed(self):
+        snapshot = [0] * 65536
+        snapshot[0:3] = (33, 0, 128)
+        cache = DecodeCache(snapshot)
+        self.assertEqual('LD HL,nn', cache.get(0)[4])
+        snapshot[0:3] = (201, 0, 0)
+        self.assertEqual(next(decode(snapshot, 0, 1)), cache.get(0))
+        self.assertEqual('RET', cache.get(0)[4])
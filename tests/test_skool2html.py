@@ -83,6 +83,10 @@ class Skool2HtmlTest(SkoolKitTestCase):
         self.tempdirs.append(self.odir)
         html_writer = None
 
+    def _read_file(self, fname, mode='r'):
+        with open(fname, mode) as f:
+            return f.read()
+
     def _write_ref_file(self, text, path=None, suffix='.ref'):
         return self.write_text_file(dedent(text).strip(), path, suffix)
 
@@ -147,6 +151,8 @@ class Skool2HtmlTest(SkoolKitTestCase):
         self.assertFalse(options.asm_labels)
         self.assertFalse(options.asm_one_page)
         self.assertFalse(options.create_labels)
+        self.assertFalse(options.incremental)
+        self.assertEqual(options.jobs, 1)
         self.assertEqual(options.single_css, '')
         self.assertEqual(options.search, [])
         self.assertEqual(options.themes, [])
@@ -172,6 +178,8 @@ class Skool2HtmlTest(SkoolKitTestCase):
             Base=16
             Case=-1
             CreateLabels=1
+            Incremental=1
+            Jobs=4
             JoinCss=css.css
             OutputDir={}
             Quiet=1
@@ -188,6 +196,8 @@ class Skool2HtmlTest(SkoolKitTestCase):
         self.assertTrue(options.asm_labels)
         self.assertTrue(options.asm_one_page)
         self.assertTrue(options.create_labels)
+        self.assertTrue(options.incremental)
+        self.assertEqual(options.jobs, 4)
         self.assertEqual(options.single_css, 'css.css')
         self.assertEqual(options.search, ['this', 'that'])
         self.assertEqual(options.themes, ['dark', 'wide'])
@@ -217,6 +227,8 @@ class Skool2HtmlTest(SkoolKitTestCase):
         self.assertFalse(options.asm_labels)
         self.assertFalse(options.asm_one_page)
         self.assertFalse(options.create_labels)
+        self.assertFalse(options.incremental)
+        self.assertEqual(options.jobs, 1)
         self.assertEqual(options.single_css, '')
         self.assertEqual(options.search, [])
         self.assertEqual(options.themes, [])
@@ -606,6 +618,7 @@ class Skool2HtmlTest(SkoolKitTestCase):
     @patch.object(skool2html, 'write_disassembly', mock_write_disassembly)
     def test_image_writer_options(self):
         exp_iw_options = (
+            ('PNGAdaptiveCompression', 1),
             ('PNGAlpha', 1),
             ('PNGCompressionLevel', 4),
             ('PNGEnableAnimation', 0)
@@ -1099,6 +1112,278 @@ class Skool2HtmlTest(SkoolKitTestCase):
     def test_option_w_i(self):
         self._test_option_w('-w', 'i', 'write_index')
 
+    def test_option_incremental(self):
+        skool = """
+            ; Routine at 32768
+            ;
+            ; {}
+            c32768 RET
+
+            ; Routine at 32769
+            c32769 JP 32768
+        """
+        skoolfile = self.write_text_file(dedent(skool.format('Foo')).strip(), suffix='.skool')
+        game_dir = os.path.join(self.odir, os.path.basename(skoolfile)[:-6])
+        asm1 = os.path.join(game_dir, 'asm', '32768.html')
+        asm2 = os.path.join(game_dir, 'asm', '32769.html')
+        all_map = os.path.join(game_dir, 'maps', 'all.html')
+        self.run_skool2html('-q --incremental -d {} {}'.format(self.odir, skoolfile))
+        self.assertTrue(os.path.isfile(os.path.join(game_dir, '.skool2html-manifest')))
+        for fname in (asm1, asm2, all_map):
+            self.write_text_file('Unchanged', fname)
+
+        self.run_skool2html('-q --incremental -d {} {}'.format(self.odir, skoolfile))
+        for fname in (asm1, asm2, all_map):
+            self.assertEqual(self._read_file(fname), 'Unchanged')
+
+        self.write_text_file(dedent(skool.format('Bar')).strip(), skoolfile)
+        self.run_skool2html('-q --incremental -d {} {}'.format(self.odir, skoolfile))
+        self.assertIn('Bar', self._read_file(asm1))
+        self.assertEqual(self._read_file(asm2), 'Unchanged')
+        self.assertNotEqual(self._read_file(all_map), 'Unchanged')
+
+        self.run_skool2html('-q -d {} {}'.format(self.odir, skoolfile))
+        self.assertNotEqual(self._read_file(asm2), 'Unchanged')
+
+    def test_option_incremental_images(self):
+        ref = """
+            [Page:Images]
+            PageContent=#UDG32768(a) #UDG32768(b) #UDG32776(c)
+        """
+        skool = """
+            ; Data
+            b32768 DEFB {},0,0,0,0,0,0,0
+             32776 DEFB 255,0,0,0,0,0,0,0
+        """
+        skoolfile = self.write_text_file(dedent(skool.format(1)).strip(), suffix='.skool')
+        reffile = self._write_ref_file(ref, '{}.ref'.format(skoolfile[:-6]))
+        game_dir = os.path.join(self.odir, os.path.basename(skoolfile)[:-6])
+        img_a, img_b, img_c = [os.path.join(game_dir, 'images', 'udgs', n + '.png') for n in 'abc']
+        self.run_skool2html('-q --incremental -d {} {}'.format(self.odir, skoolfile))
+        self.assertEqual(self._read_file(img_a, 'rb'), self._read_file(img_b, 'rb'))
+        self.assertNotEqual(self._read_file(img_a, 'rb'), self._read_file(img_c, 'rb'))
+        for fname in (img_a, img_b, img_c):
+            os.utime(fname, (0, 0))
+
+        self.run_skool2html('-q --incremental -d {} {}'.format(self.odir, skoolfile))
+        for fname in (img_a, img_b, img_c):
+            self.assertEqual(os.path.getmtime(fname), 0)
+
+        self.write_text_file(dedent(skool.format(2)).strip(), skoolfile)
+        self.run_skool2html('-q --incremental -d {} {}'.format(self.odir, skoolfile))
+        self.assertNotEqual(os.path.getmtime(img_a), 0)
+        self.assertEqual(self._read_file(img_a, 'rb'), self._read_file(img_b, 'rb'))
+        self.assertEqual(os.path.getmtime(img_c), 0)
+
+    def test_option_incremental_with_new_images(self):
+        ref = """
+            [Page:Images]
+            PageContent=#UDG32768(a)
+        """
+        skoolfile = self.write_text_file('; Data\nb32768 DEFB 1,0,0,0,0,0,0,0', suffix='.skool')
+        reffile = self._write_ref_file(ref, '{}.ref'.format(skoolfile[:-6]))
+        game_dir = os.path.join(self.odir, os.path.basename(skoolfile)[:-6])
+        img_a = os.path.join(game_dir, 'images', 'udgs', 'a.png')
+        self.run_skool2html('-q --incremental -d {} {}'.format(self.odir, skoolfile))
+        png = self._read_file(img_a, 'rb')
+        os.utime(img_a, (0, 0))
+
+        self.run_skool2html('-q --incremental -o -d {} {}'.format(self.odir, skoolfile))
+        self.assertNotEqual(os.path.getmtime(img_a), 0)
+        self.assertEqual(self._read_file(img_a, 'rb'), png)
+
+        os.utime(img_a, (0, 0))
+        self.run_skool2html('-q --incremental -d {} {}'.format(self.odir, skoolfile))
+        self.assertEqual(os.path.getmtime(img_a), 0)
+
+    def test_option_incremental_after_full_run(self):
+        skool = "; Routine at 32768\n;\n; {}\nc32768 RET"
+        skoolfile = self.write_text_file(skool.format('Foo'), suffix='.skool')
+        game_dir = os.path.join(self.odir, os.path.basename(skoolfile)[:-6])
+        manifest = os.path.join(game_dir, '.skool2html-manifest')
+        asm = os.path.join(game_dir, 'asm', '32768.html')
+        self.run_skool2html('-q --incremental -d {} {}'.format(self.odir, skoolfile))
+        self.assertTrue(os.path.isfile(manifest))
+
+        self.write_text_file(skool.format('Bar'), skoolfile)
+        self.run_skool2html('-q -d {} {}'.format(self.odir, skoolfile))
+        self.assertFalse(os.path.isfile(manifest))
+        self.assertIn('Bar', self._read_file(asm))
+
+        self.write_text_file(skool.format('Foo'), skoolfile)
+        self.run_skool2html('-q --incremental -d {} {}'.format(self.odir, skoolfile))
+        self.assertIn('Foo', self._read_file(asm))
+        self.assertTrue(os.path.isfile(manifest))
+
+    def test_option_incremental_with_deleted_or_changed_images(self):
+        skool = """
+            ; Routine at 32768
+            ;
+            ; #UDG32768(a) #UDG32776(b)
+            c32768 RET
+
+            ; Data
+            b32769 DEFB 0,0,0,0,0,0,0
+             32776 DEFB 255,0,0,0,0,0,0,0
+        """
+        skoolfile = self.write_text_file(dedent(skool).strip(), suffix='.skool')
+        game_dir = os.path.join(self.odir, os.path.basename(skoolfile)[:-6])
+        asm = os.path.join(game_dir, 'asm', '32768.html')
+        img_a, img_b = [os.path.join(game_dir, 'images', 'udgs', n + '.png') for n in 'ab']
+        self.run_skool2html('-q --incremental -d {} {}'.format(self.odir, skoolfile))
+        png_a = self._read_file(img_a, 'rb')
+        png_b = self._read_file(img_b, 'rb')
+
+        self.write_text_file('Unchanged', asm)
+        os.remove(img_a)
+        self.write_text_file('Changed', img_b)
+        self.run_skool2html('-q --incremental -d {} {}'.format(self.odir, skoolfile))
+        self.assertNotEqual(self._read_file(asm), 'Unchanged')
+        self.assertEqual(self._read_file(img_a, 'rb'), png_a)
+        self.assertEqual(self._read_file(img_b, 'rb'), png_b)
+
+        self.write_text_file('Unchanged', asm)
+        self.run_skool2html('-q --incremental -d {} {}'.format(self.odir, skoolfile))
+        self.assertEqual(self._read_file(asm), 'Unchanged')
+
+    def test_option_incremental_with_shared_state(self):
+        skool = """
+            ; Routine at 32768
+            ;
+            ; #POKES32768,{}
+            c32768 RET
+
+            ; Routine at 32769
+            ;
+            ; #PEEK32768
+            c32769 RET
+        """
+        skoolfile = self.write_text_file(dedent(skool.format(9)).strip(), suffix='.skool')
+        game_dir = os.path.join(self.odir, os.path.basename(skoolfile)[:-6])
+        asm2 = os.path.join(game_dir, 'asm', '32769.html')
+        self.run_skool2html('-q --incremental -d {} {}'.format(self.odir, skoolfile))
+        self.assertIn('<div class="details">\n<div class="paragraph">\n9\n</div>', self._read_file(asm2))
+
+        self.write_text_file(dedent(skool.format(7)).strip(), skoolfile)
+        self.run_skool2html('-q --incremental -d {} {}'.format(self.odir, skoolfile))
+        self.assertIn('<div class="details">\n<div class="paragraph">\n7\n</div>', self._read_file(asm2))
+
+    def test_option_jobs(self):
+        ref = """
+            [OtherCode:other]
+            Source={}
+            [Page:CustomPage]
+            PageContent=#R32768
+        """
+        skool = """
+            ; Routine at 32768
+            ;
+            ; Used by the routine at #R32771.
+            c32768 LD HL,32771
+            ; #UDG32771
+             32771 RET
+
+            ; Data
+            b32772 DEFB 1,2,3,4,5,6,7,8
+
+            ; Message
+            t32780 DEFM "Hi"
+        """
+        other_skool = "; Other code routine\nc49152 JP 49152"
+        other_skoolfile = self.write_text_file(other_skool, suffix='.skool')
+        reffile = self._write_ref_file(ref.format(other_skoolfile))
+        skoolfile = self.write_text_file(dedent(skool).strip(), '{}.skool'.format(reffile[:-4]))
+        game = os.path.basename(skoolfile)[:-6]
+        outputs = []
+        for option in ('', '--jobs 3'):
+            odir = self.make_directory()
+            output, error = self.run_skool2html('-q {} -d {} {}'.format(option, odir, skoolfile))
+            self.assertEqual(error, '')
+            files = {}
+            for root, dirs, fnames in os.walk(os.path.join(odir, game)):
+                for fname in fnames:
+                    path = os.path.join(root, fname)
+                    with open(path, 'rb') as f:
+                        files[os.path.relpath(path, odir)] = f.read()
+            outputs.append(files)
+        self.assertIn(os.path.join(game, 'asm', '32768.html'), outputs[0])
+        self.assertIn(os.path.join(game, 'other', '49152.html'), outputs[0])
+        self.assertEqual(sorted(outputs[0]), sorted(outputs[1]))
+        for fname, contents in outputs[0].items():
+            self.assertEqual(contents, outputs[1][fname], '{} differs'.format(fname))
+
+    def _test_option_jobs(self, ref, skool, jobs_used):
+        reffile = self._write_ref_file(ref)
+        skoolfile = self.write_text_file(dedent(skool).strip(), '{}.skool'.format(reffile[:-4]))
+        game = os.path.basename(skoolfile)[:-6]
+        outputs = []
+        for option in ('', '--jobs 3'):
+            odir = self.make_directory()
+            output, error = self.run_skool2html('{} -d {} {}'.format(option, odir, skoolfile))
+            self.assertEqual(error, '')
+            files = {}
+            for root, dirs, fnames in os.walk(os.path.join(odir, game)):
+                for fname in fnames:
+                    path = os.path.join(root, fname)
+                    with open(path, 'rb') as f:
+                        files[os.path.relpath(path, odir)] = f.read()
+            outputs.append(files)
+        self.assertEqual('Writing files using 3 jobs' in output, jobs_used)
+        self.assertEqual(sorted(outputs[0]), sorted(outputs[1]))
+        for fname, contents in outputs[0].items():
+            self.assertEqual(contents, outputs[1][fname], '{} differs'.format(fname))
+        return game, outputs[0]
+
+    def test_option_jobs_with_same_image_on_different_pages(self):
+        ref = """
+            [Page:Page1]
+            PageContent=#UDG32768(same)
+            [Page:Page2]
+            PageContent=#UDG32776,56(same)
+            [Page:Page3]
+            PageContent=#UDG32776,56(same)
+        """
+        skool = """
+            ; Data
+            b32768 DEFB 1,2,3,4,5,6,7,8
+             32776 DEFB 8,7,6,5,4,3,2,1
+        """
+        game, files = self._test_option_jobs(ref, skool, True)
+        self.assertNotIn('.tmp', ''.join(files))
+
+    def test_option_jobs_with_shared_state_macros(self):
+        contents = (
+            ('#POKES32768,9', '#PEEK32768'),
+            ('#LET(n=9)', '#EVAL({n})'),
+            ('#DEFINE0(N,9)', '#N'),
+            ('#PUSHS #POKES32768,9', '#PEEK32768'),
+            ('#UDG32768(*foo)', '#UDGARRAY*foo(bar)')
+        )
+        for content1, content2 in contents:
+            ref = """
+                [Page:Page1]
+                PageContent={}
+                [Page:Page2]
+                PageContent={}
+            """.format(content1, content2)
+            skool = """
+                ; Data
+                b32768 DEFB 1
+            """
+            self._test_option_jobs(ref, skool, False)
+
+    @patch.object(skool2html.sys, 'platform', 'darwin')
+    def test_option_jobs_on_macos(self):
+        ref = """
+            [Page:Page1]
+            PageContent=#PEEK32768
+        """
+        skool = """
+            ; Data
+            b32768 DEFB 1
+        """
+        self._test_option_jobs(ref, skool, False)
+
     def test_option_V(self):
         for option in ('-V', '--version'):
             output, error = self.run_skool2html(option, catch_exit=0)
@@ -1340,6 +1625,8 @@ class Skool2HtmlTest(SkoolKitTestCase):
             Base=0
             Case=0
             CreateLabels=0
+            Incremental=0
+            Jobs=1
             JoinCss=
             OutputDir=.
             Quiet=0
@@ -1368,6 +1655,8 @@ class Skool2HtmlTest(SkoolKitTestCase):
             Base=0
             Case=0
             CreateLabels=0
+            Incremental=0
+            Jobs=1
             JoinCss=
             OutputDir=html
             Quiet=1
@@ -207,18 +207,25 @@ class MockFileInfo:
     def __init__(self):
         self.fname = None
         self.mode = None
+        self.incremental = False
 
     def open_file(self, *names, mode='w'):
         self.fname = join(*names)
         self.mode = mode
         return StringIO()
 
-    def add_image(self, image_path):
+    def open_image(self, image_path):
+        return self.open_file(image_path, mode='wb')
+
+    def add_image(self, image_path, digest=None):
         return
 
-    def need_image(self, image_path):
+    def need_image(self, image_path, digest=None):
         return True
 
+    def find_image(self, digest):
+        return None
+
 class TestImageWriter(ImageWriter):
     def write_image(self, frames, img_file):
         self.frames = frames
@@ -1288,6 +1295,24 @@ class MethodTest(HtmlWriterTestCase):
         with self.assertRaisesRegex(SkoolKitError, "^Invalid include directive: Unrecognised field 'no'$"):
             self._get_writer(ref=ref).format_template('include', {})
 
+    def test_format_template_repeatedly(self):
+        ref = """
+            [Template:loop]
+            <# foreach($item,list) #>
+            <# if($item[on]) #>
+            On: {$item[name]}
+            <# else #>
+            Off: {$item[name]}
+            <# endif #>
+            <# endfor #>
+        """
+        writer = self._get_writer(ref=ref)
+        fields1 = {'list': ({'on': 1, 'name': 'a'}, {'on': 0, 'name': 'b'})}
+        self.assertEqual('On: a\nOff: b', writer.format_template('loop', fields1))
+        fields2 = {'list': ({'on': 0, 'name': 'c'},)}
+        self.assertEqual('Off: c', writer.format_template('loop', fields2))
+        self.assertEqual('On: a\nOff: b', writer.format_template('loop', fields1))
+
     def test_format_template_with_indented_directives(self):
         ref = """
             [Template:test]
@@ -2016,6 +2041,15 @@ class SkoolMacroTest(HtmlWriterTestCase, CommonSkoolMacroTest):
         # Explicit code ID and non-existent reference
         self._assert_error(writer, '#R$ABCD@main', 'Could not find instruction at $ABCD', prefix)
 
+    def test_macro_r_repeated(self):
+        skool = 'c40000 LD A,B\n 40001 RET'
+        writer = self._get_writer(skool=skool)
+
+        for cwd, href in ((ASMDIR, '40000.html#40001'), ('', 'asm/40000.html#40001')):
+            for link_text in ('', 'foo', 'bar'):
+                output = writer.expand('#R40001({})'.format(link_text), cwd)
+                self._assert_link_equals(output, href, link_text or '40001')
+
     def test_macro_r_asm_single_page(self):
         ref = '[Game]\nAsmSinglePage=1'
         skool = 'c40000 LD A,B\n 40001 RET'
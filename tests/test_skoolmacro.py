@@ -1,6 +1,7 @@
 import re
 
 from skoolkittest import SkoolKitTestCase
+from skoolkit import skoolmacro
 from skoolkit.skoolmacro import (parse_ints, parse_strings, parse_brackets, parse_image_macro,
                                  parse_address_range, MacroParsingError, NoParametersError, MissingParameterError,
                                  TooManyParametersError)
@@ -106,6 +107,12 @@ class SkoolMacroTest(SkoolKitTestCase):
         names = ('foo', 'bar', 'baz')
         self.assertEqual([len(text), 4, 2, 15], parse_ints(text, names=names))
 
+    def test_parse_ints_cache_is_bounded(self):
+        cache_info = skoolmacro._get_cached_params.cache_info
+        for i in range(cache_info().maxsize + 10):
+            self.assertEqual([2 + len(str(i)), 1, i], parse_ints('1,{}'.format(i), num=2))
+        self.assertEqual(cache_info().currsize, cache_info().maxsize)
+
     def test_parse_ints_not_enough_parameters(self):
         with self.assertRaisesRegex(MacroParsingError, re.escape("Not enough parameters (expected 4): '1,2,$3'")):
             parse_ints('1,2,$3', num=4)
@@ -1,10 +1,13 @@
 from textwrap import dedent
+import os
+import pickle
 import re
 from unittest.mock import patch
 
 from skoolkittest import SkoolKitTestCase
 from skoolkit import SkoolParsingError, BASE_10, BASE_16, components, z80
 from skoolkit.skoolparser import SkoolParser, TableParser, set_bytes, CASE_LOWER, CASE_UPPER
+from skoolkit.snapshot import Memory
 
 TEST_BASE_CONVERSION_SKOOL = r"""
 c30000 LD A,%11101011
@@ -1671,6 +1674,14 @@ class SkoolParserTest(SkoolKitTestCase):
         self.assertEqual(parser.snapshot[24591:24600], [1, 44, 1, 97, 98, 99, 7, 7, 7])
         self.assertEqual(parser.snapshot[24600:24609], [160, 44, 129, 97, 98, 17, 170, 170, 170])
         self.assertEqual(parser.snapshot[24609:24618], [15, 99, 15, 170, 240, 98, 99, 0, 0])
+        self.assertIsInstance(parser.snapshot, Memory)
+
+    def test_base_snapshot_is_modified_in_place(self):
+        for snapshot in ([0] * 65536, Memory([0] * 65536)):
+            with self.subTest(snapshot_type=type(snapshot)):
+                parser = self._get_parser('b40000 DEFB 1,2', html=True, snapshot=snapshot)
+                self.assertIs(parser.snapshot, snapshot)
+                self.assertEqual(snapshot[40000:40002], [1, 2])
 
     def test_nested_braces(self):
         skool = """
@@ -5515,6 +5526,7 @@ class SkoolParserTest(SkoolKitTestCase):
         self.assertEqual(parser.mode.asm_labels, clone.mode.asm_labels)
         self.assertEqual([1, 2, 3, 4, 5, 6, 7, 8], parser.snapshot[40000:40008])
         self.assertEqual([1, 2, 9, 10, 11, 12, 7, 8], clone.snapshot[40000:40008])
+        self.assertIsInstance(clone.snapshot, Memory)
         self.assertEqual(parser.fields, clone.fields)
         self.assertEqual(parser.expands, clone.expands)
         self.assertIsNot(parser.expands, clone.expands)
@@ -5693,6 +5705,144 @@ class SkoolParserTest(SkoolKitTestCase):
         self.assertEqual([1, 2], parser.snapshot[40000:40002])
         self.assertEqual((1, 2), parser.get_instruction(40000).bytes)
 
+    def _parse_with_cache(self, skool, **kwargs):
+        cache_dir = self.make_directory()
+        self.write_text_file('[skoolkit]\nSkoolFileCache={}'.format(cache_dir), 'skoolkit.ini')
+        skoolfile = self.write_text_file(dedent(skool).strip(), suffix='.skool')
+        with patch.object(components, 'SK_CONFIG', None):
+            parser1 = SkoolParser(skoolfile, **kwargs)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            with patch.object(SkoolParser, '_parse_skool', side_effect=AssertionError('Skool file was parsed')):
+                parser2 = SkoolParser(skoolfile, **kwargs)
+        return parser1, parser2
+
+    def _summarise(self, parser):
+        entries = []
+        for entry in parser.memory_map:
+            instructions = []
+            for i in entry.instructions:
+                ref = i.reference
+                if ref:
+                    ref = (ref.entry.address, ref.entry.asm_id, ref.address, ref.addr_str, ref.use_label)
+                instructions.append((i.address, i.addr_str, i.operation, i.asm_label, i.bytes,
+                                     i.comment and (i.comment.rowspan, i.comment.text), i.mid_block_comment,
+                                     ref, [r.address for r in i.referrers]))
+            entries.append((entry.address, entry.ctl, entry.description, entry.details, entry.end_comment,
+                            entry.size, [(r.name, r.contents) for r in entry.registers],
+                            [r.address for r in entry.referrers], instructions))
+        return entries
+
+    def test_skool_file_cache(self):
+        skool = """
+            @start
+            @remote=save:32768
+            @expand=#DEF(#FOO foo)
+            ; Start
+            ;
+            ; The beginning.
+            ;
+            ; A Some value
+            @label=START
+            c40000 LD A,1   ; Load A
+            *40002 CALL 32768
+            ; Mid-block comment.
+             40005 JR 40002
+
+            ; Data
+            b40007 DEFB 1,2,3
+            ; The end.
+        """
+        for kwargs in ({'html': True, 'create_labels': True}, {'asm_mode': 1}):
+            with self.subTest(kwargs=kwargs):
+                parser1, parser2 = self._parse_with_cache(skool, **kwargs)
+                self.assertEqual(self._summarise(parser1), self._summarise(parser2))
+                self.assertEqual(parser1.snapshot, parser2.snapshot)
+                self.assertEqual(parser1.expands, parser2.expands)
+                self.assertIs(parser2.get_entry(40000), parser2.memory_map[0])
+                self.assertIs(parser2.get_instruction(40002).container, parser2.memory_map[0])
+                self.assertEqual(parser2.get_instruction(32768, 'save').container.asm_id, 'save')
+                self.assertEqual(parser1.get_asm_label(40002), parser2.get_asm_label(40002))
+
+    def test_skool_file_cache_replays_warnings(self):
+        skool = """
+            @start
+            @label=START
+            c30000 LD HL,30000
+        """
+        parser1, parser2 = self._parse_with_cache(skool, asm_mode=1, warnings=True)
+        warnings = self.err.getvalue().split('WARNING: ')[1:]
+        self.assertEqual(len(warnings), 2)
+        self.assertEqual(warnings[0], warnings[1])
+
+    def test_skool_file_cache_restores_mode_state(self):
+        skool = """
+            @start
+            @set-bullet=+
+            @assemble=,2
+            @label=START
+            c30000 LD HL,30000
+        """
+        parser1, parser2 = self._parse_with_cache(skool, asm_mode=1)
+        self.assertEqual(parser2.properties, {'bullet': '+'})
+        self.assertEqual(parser2.mode.assemble, 2)
+        self.assertEqual(parser2.mode.labels, parser1.mode.labels)
+        self.assertIs(parser2.mode.assembler, parser2._assembler)
+
+    def test_skool_file_cache_ignores_invalid_cache_file(self):
+        cache_dir = self.make_directory()
+        self.write_text_file('[skoolkit]\nSkoolFileCache={}'.format(cache_dir), 'skoolkit.ini')
+        skoolfile = self.write_text_file('; Data\nb40000 DEFB 1,2', suffix='.skool')
+        with patch.object(components, 'SK_CONFIG', None):
+            SkoolParser(skoolfile, html=True)
+            cache = os.path.join(cache_dir, os.listdir(cache_dir)[0])
+            for contents in (b'', b'garbage', pickle.dumps({'entries': 1}), pickle.dumps(None)):
+                with self.subTest(contents=contents):
+                    with open(cache, 'wb') as f:
+                        f.write(contents)
+                    parser = SkoolParser(skoolfile, html=True)
+                    self.assertEqual(parser.snapshot[40000:40002], [1, 2])
+                    self.assertEqual(len(parser.memory_map), 1)
+                    with patch.object(SkoolParser, '_parse_skool', side_effect=AssertionError('Skool file was parsed')):
+                        parser = SkoolParser(skoolfile, html=True)
+                    self.assertEqual(parser.get_instruction(40000).operation, 'DEFB 1,2')
+
+    def test_skool_file_cache_key_includes_components(self):
+        cache_dir = self.make_directory()
+        skoolfile = self.write_text_file('; Data\nb40000 DEFB 1', suffix='.skool')
+        for evaluator in ('skoolkit.z80', 'skoolkit.textutils'):
+            self.write_text_file('[skoolkit]\nSkoolFileCache={}\nOperandEvaluator={}'.format(cache_dir, evaluator), 'skoolkit.ini')
+            with patch.object(components, 'SK_CONFIG', None):
+                SkoolParser(skoolfile)
+        self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+    def test_skool_file_cache_in_unwritable_directory(self):
+        tempdir = self.make_directory()
+        read_only_dir = os.path.join(tempdir, 'read-only')
+        os.mkdir(read_only_dir, 0o555)
+        not_a_dir = os.path.join(self.write_text_file(path=os.path.join(tempdir, 'file')), 'cache')
+        skoolfile = self.write_text_file('; Data\nb40000 DEFB 1,2', suffix='.skool')
+        try:
+            for cache_dir in (read_only_dir, not_a_dir):
+                with self.subTest(cache_dir=cache_dir):
+                    self.write_text_file('[skoolkit]\nSkoolFileCache={}'.format(cache_dir), 'skoolkit.ini')
+                    with patch.object(components, 'SK_CONFIG', None):
+                        parser = SkoolParser(skoolfile, html=True)
+                    self.assertEqual(parser.snapshot[40000:40002], [1, 2])
+                    self.assertEqual(len(parser.memory_map), 1)
+            self.assertEqual([f for f in os.listdir(read_only_dir) if f.endswith('.tmp')], [])
+        finally:
+            os.chmod(read_only_dir, 0o755)
+
+    def test_skool_file_cache_with_unpicklable_state(self):
+        cache_dir = self.make_directory()
+        self.write_text_file('[skoolkit]\nSkoolFileCache={}'.format(cache_dir), 'skoolkit.ini')
+        skoolfile = self.write_text_file('; Data\nb40000 DEFB 1,2', suffix='.skool')
+        with patch.object(components, 'SK_CONFIG', None):
+            with patch.object(pickle, 'dump', side_effect=pickle.PicklingError('Cannot pickle')):
+                parser = SkoolParser(skoolfile, html=True)
+        self.assertEqual(parser.snapshot[40000:40002], [1, 2])
+        self.assertEqual(os.listdir(cache_dir), [])
+
 class TableParserTest(SkoolKitTestCase):
     class MockWriter:
         def expand(self, text):
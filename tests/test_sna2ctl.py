@@ -914,6 +914,16 @@ class Sna2CtlTest(SkoolKitTestCase):
     def test_option_m_fuse(self):
         self._test_option_m(self._create_fuse_profile(TEST_MAP), '--map')
 
+    def test_option_m_progress_messages(self):
+        binfile = self.write_bin_file(TEST_MAP_BIN, suffix='.bin')
+        code_map = self._create_fuse_profile(TEST_MAP) * 100
+        code_map_file = self.write_text_file('\n'.join(code_map), suffix='.log')
+        output, error = self.run_sna2ctl('-m {} -o {} {}'.format(code_map_file, TEST_MAP_BIN_ORG, binfile))
+        self.assertEqual(TEST_MAP_CTL_G, output)
+        progress = re.findall('([0-9]+)%(\x08+)', error)
+        self.assertEqual(len(set(progress)), len(progress))
+        self.assertEqual(('100', '\x08' * 4), progress[-1])
+
     def test_option_m_specemu_log(self):
         self._test_option_m(self._create_specemu_log(TEST_MAP), '-m')
 
@@ -631,6 +631,16 @@ class Sna2ImgTest(SkoolKitTestCase):
         exp_udgs[0][1] = Udg(0, [170, 0, 0, 0, 0, 0, 0, 0])
         self._test_sna2img(mock_open, '-p 16384,255 --poke 16385,170', scr, exp_udgs)
 
+    @patch.object(sna2img, 'ImageWriter', MockImageWriter)
+    @patch.object(sna2img, 'open')
+    def test_option_p_with_out_of_range_values(self, mock_open):
+        scr = [0] * 6912
+        exp_udgs = [[Udg(0, [0] * 8)] * 32 for i in range(24)]
+        exp_udgs[0][0] = Udg(0, [0, 0, 0, 0, 0, 0, 0, 0])
+        exp_udgs[0][1] = Udg(0, [44, 0, 0, 0, 0, 0, 0, 0])
+        exp_udgs[0][2] = Udg(0, [255, 0, 0, 0, 0, 0, 0, 0])
+        self._test_sna2img(mock_open, '-p 16384,256 -p 16385,+300 -p 16386,^511', scr, exp_udgs)
+
     def test_option_p_invalid_values(self):
         self._test_bad_spec('-p 1', 'Value missing in poke spec: 1')
         self._test_bad_spec('-p q', 'Value missing in poke spec: q')
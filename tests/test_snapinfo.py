@@ -1,3 +1,4 @@
+import json
 from textwrap import dedent
 from unittest.mock import patch
 
@@ -13,18 +14,18 @@ def mock_config(name):
     return {k: v[0] for k, v in COMMANDS[name].items()}
 
 class MockBasicLister:
-    def list_basic(self, snapshot):
+    def get_lines(self, snapshot):
         global mock_basic_lister
         mock_basic_lister = self
         self.snapshot = snapshot
-        return 'BASIC DONE!'
+        return ['BASIC DONE!']
 
 class MockVariableLister:
-    def list_variables(self, snapshot):
+    def get_lines(self, snapshot):
         global mock_variable_lister
         mock_variable_lister = self
         self.snapshot = snapshot
-        return 'VARIABLES DONE!'
+        return ['VARIABLES DONE!']
 
 class SnapinfoTest(SkoolKitTestCase):
     def _test_sna(self, ram, exp_output, options='', ctl=None, ctlfiles=(), header=None, suffix='.sna'):
@@ -100,9 +101,62 @@ class SnapinfoTest(SkoolKitTestCase):
         self.assertIsNone(options.tile)
         self.assertFalse(options.variables)
         self.assertIsNone(options.word)
+        self.assertEqual(options.jobs, 1)
         self.assertEqual(config['NodeAttributes'], 'shape=circle')
         self.assertEqual(config['NodeLabel'], '"{label}"')
 
+    def _write_snapshots(self, text):
+        snapshots = []
+        tempdir = self.make_directory()
+        for i in range(3):
+            ram = [0] * 49152
+            ram[1000 + i:1000 + i + len(text)] = [ord(c) for c in text]
+            snapshots.append(self.write_bin_file([0] * 27 + ram, '{}/game{}.sna'.format(tempdir, i)))
+        self.write_bin_file([0] * 127, '{}/bad.sna'.format(tempdir))
+        self.write_text_file('Not a snapshot', '{}/game.txt'.format(tempdir))
+        return tempdir, snapshots
+
+    def _test_batch(self, options, infile, exp_results):
+        output, error = self.run_snapinfo('{} {}'.format(options, infile))
+        self.assertEqual(error, '')
+        self.assertEqual(exp_results, [json.loads(line) for line in output.split('\n')[:-1]])
+
+    def test_batch_directory(self):
+        tempdir, snapshots = self._write_snapshots('foo')
+        exp_results = [{'file': '{}/bad.sna'.format(tempdir), 'error': 'RAM size is 100', 'output': []}]
+        for i, snafile in enumerate(snapshots):
+            a = 17384 + i
+            exp_results.append({'file': snafile, 'output': ['{0}-{1} {0:04X}-{1:04X}: foo'.format(a, a + 2)]})
+        self._test_batch('-t foo', tempdir, exp_results)
+
+    def test_batch_with_truncated_snapshot(self):
+        tempdir, snapshots = self._write_snapshots('foo')
+        truncated = self.write_bin_file([0] * 10, '{}/truncated.z80'.format(tempdir))
+        for option in ('', '--jobs 2 '):
+            with self.subTest(option=option):
+                output, error = self.run_snapinfo('{}-t foo {}'.format(option, tempdir))
+                self.assertEqual(error, '')
+                results = [json.loads(line) for line in output.split('\n')[:-1]]
+                self.assertEqual([r['file'] for r in results], sorted(['{}/bad.sna'.format(tempdir), truncated] + snapshots))
+                self.assertEqual(results[-1], {'file': truncated, 'error': 'IndexError: index out of range', 'output': []})
+                self.assertEqual(results[1]['output'], ['17384-17386 43E8-43EA: foo'])
+
+    def test_batch_glob_pattern(self):
+        tempdir, snapshots = self._write_snapshots('bar')
+        exp_results = [
+            {'file': snapshots[0], 'output': ['17384 43E8:  98  62  01100010  b']},
+            {'file': snapshots[1], 'output': ['17384 43E8:   0  00  00000000  ']},
+            {'file': snapshots[2], 'output': ['17384 43E8:   0  00  00000000  ']}
+        ]
+        self._test_batch('-p 17384', '{}/game*.sna'.format(tempdir), exp_results)
+
+    def test_option_jobs(self):
+        tempdir, snapshots = self._write_snapshots('baz')
+        output, error = self.run_snapinfo('-t baz {}'.format(tempdir))
+        self.assertEqual(error, '')
+        for jobs in (2, 3):
+            self._test_batch('--jobs {} -t baz'.format(jobs), tempdir, [json.loads(line) for line in output.split('\n')[:-1]])
+
     def test_invalid_option(self):
         output, error = self.run_snapinfo('-x test.z80', catch_exit=2)
         self.assertEqual(output, '')
@@ -957,6 +1011,20 @@ class SnapinfoTest(SkoolKitTestCase):
         """
         self._test_sna(ram, exp_output, '-f {}-1-5'.format(seq_str))
 
+    def test_option_find_multiple(self):
+        ram = [0] * 49152
+        ram[32768 - 16384:32771 - 16384] = (1, 2, 3)
+        ram[40000 - 16384:40006 - 16384:2] = (4, 5, 6)
+        ram[50000 - 16384:50003 - 16384] = (1, 2, 3)
+        exp_output = """
+            32768-32770-1 8000-8002-1: 1,2,3
+            50000-50002-1 C350-C352-1: 1,2,3
+            40000-40004-2 9C40-9C44-2: 4,5,6
+            29999-29999-1 752F-752F-1: 255
+        """
+        ram[29999 - 16384] = 255
+        self._test_sna(ram, exp_output, '-f 1,2,3 --find 4,5,6-2 -f 255 -f 256')
+
     def test_option_f_with_hexadecimal_values(self):
         ram = [0] * 49152
         address = 47983
@@ -1678,6 +1746,18 @@ class SnapinfoTest(SkoolKitTestCase):
             exp_output += '{0}-{1} {0:04X}-{1:04X}: {2}\n'.format(a, a + len(text) - 1, text)
         self._test_sna(ram, exp_output, '--find-text {}'.format(text))
 
+    def test_option_find_text_multiple(self):
+        ram = [0] * 49152
+        ram[30000 - 16384:30003 - 16384] = [ord(c) for c in 'foo']
+        ram[40000 - 16384:40003 - 16384] = [ord(c) for c in 'bar']
+        ram[50000 - 16384:50001 - 16384] = (7,)
+        exp_output = """
+            50000-50000-1 C350-C350-1: 7
+            40000-40002 9C40-9C42: bar
+            30000-30002 7530-7532: foo
+        """
+        self._test_sna(ram, exp_output, '-t bar --find-text foo -f 7')
+
     def test_option_t_with_no_occurrences(self):
         ram = [0] * 49152
         exp_output = ''
@@ -1704,6 +1784,28 @@ class SnapinfoTest(SkoolKitTestCase):
         """
         self._test_sna(ram, exp_output, '-T {},{}'.format(x, y))
 
+    def test_option_T_takes_precedence_over_option_t(self):
+        ram = [0] * 49152
+        tile_addr = 54212
+        tile_data = [0, 24, 12, 6, 127, 6, 12, 24]
+        x, y = 3, 7
+        df_addr = 16384 + 2048 * (y // 8) + 32 * (y & 7) + x
+        ram[df_addr - 16384:df_addr - 14336:256] = tile_data
+        ram[tile_addr - 16384:tile_addr - 16376] = tile_data
+        ram[30000 - 16384:30003 - 16384] = [ord(c) for c in 'foo']
+        exp_output = """
+            |        |
+            |   **   |
+            |    **  |
+            |     ** |
+            | *******|
+            |     ** |
+            |    **  |
+            |   **   |
+            54212-54219-1 D3C4-D3CB-1: 0,24,12,6,127,6,12,24
+        """
+        self._test_sna(ram, exp_output, '-T {},{} -t foo'.format(x, y))
+
     def test_option_find_tile_with_step(self):
         ram = [0] * 49152
         tile_addr = 27483
@@ -1,5 +1,5 @@
 from skoolkittest import SkoolKitTestCase
-from skoolkit.snapshot import get_snapshot, make_z80_ram_block, SnapshotError
+from skoolkit.snapshot import ByteMemory, Memory, get_snapshot, make_z80_ram_block, SnapshotError
 
 class SnapshotTest(SkoolKitTestCase):
     def _check_ram(self, ram, exp_ram, model, out_7ffd, pages, page):
@@ -18,6 +18,64 @@ class SnapshotTest(SkoolKitTestCase):
                 page = out_7ffd & 7
             self.assertEqual(ram[32768:], pages.get(page, exp_ram[32768:]))
 
+class ByteMemoryTest(SkoolKitTestCase):
+    def test_list_compatibility(self):
+        memory = ByteMemory(4)
+        memory[1:3] = [1, 2]
+        memory[3] = 3
+        self.assertEqual(memory, [0, 1, 2, 3])
+        self.assertNotEqual(memory, [0, 1, 2])
+        self.assertEqual(memory[3], 3)
+        self.assertEqual(memory[1:3], [1, 2])
+        self.assertIsInstance(memory[:], list)
+        self.assertEqual([4] + memory, [4, 0, 1, 2, 3])
+        self.assertEqual(memory + [4], [0, 1, 2, 3, 4])
+
+    def test_save_and_restore(self):
+        memory = ByteMemory(range(4))
+        memory.save()
+        memory[1] = 10
+        memory.save()
+        memory[2:4] = [20, 30]
+        self.assertEqual(memory, [0, 10, 20, 30])
+        memory.restore()
+        self.assertEqual(memory, [0, 10, 2, 3])
+        memory.restore()
+        self.assertEqual(memory, [0, 1, 2, 3])
+
+    def test_get_snapshot_returns_byte_memory(self):
+        snapshot = get_snapshot(self.write_bin_file([0] * 27 + [1] * 49152, suffix='.sna'))
+        self.assertIsInstance(snapshot, ByteMemory)
+        self.assertEqual(len(snapshot), 65536)
+        self.assertEqual(snapshot[16383:16385], [0, 1])
+
+class MemoryTest(SkoolKitTestCase):
+    def test_save_and_restore(self):
+        memory = Memory(range(8))
+        memory.save()
+        memory[1] = 10
+        memory[2:7:2] = [20] * 3
+        memory[-1] = 30
+        memory.save()
+        memory[1] = 40
+        memory[0:2] = [50, 60]
+        self.assertEqual([50, 60, 20, 3, 20, 5, 20, 30], memory)
+        memory.restore()
+        self.assertEqual([0, 10, 20, 3, 20, 5, 20, 30], memory)
+        memory.restore()
+        self.assertEqual(list(range(8)), memory)
+
+    def test_restore_after_resizing(self):
+        memory = Memory(range(4))
+        memory.save()
+        memory[0] = 10
+        memory[1:2] = [11, 12]
+        memory.append(13)
+        del memory[3]
+        self.assertEqual([10, 11, 12, 3, 13], memory)
+        memory.restore()
+        self.assertEqual([0, 1, 2, 3], memory)
+
 class ErrorTest(SnapshotTest):
     def test_unknown_file_type(self):
         file_type = 'tzx'
@@ -1,3 +1,4 @@
+import json
 import os
 import textwrap
 import urllib
@@ -73,6 +74,8 @@ class Tap2SnaTest(SkoolKitTestCase):
         self.assertIsNone(options.start)
         self.assertEqual([], options.state)
         self.assertEqual(options.user_agent, '')
+        self.assertEqual(options.jobs, 1)
+        self.assertIsNone(options.manifest)
 
     def test_no_arguments(self):
         output, error = self.run_tap2sna(catch_exit=2)
@@ -173,6 +176,107 @@ class Tap2SnaTest(SkoolKitTestCase):
             self.assertEqual(snapshot[23296], 1)
             mock_urlopen.return_value.seek(0)
 
+    def _test_batch(self, args, exp_results):
+        output, error = self.run_tap2sna(args)
+        self.assertEqual(error, '')
+        results = [json.loads(line) for line in output.split('\n')[:-1]]
+        for result in results:
+            self.assertIsInstance(result.pop('time'), float)
+        self.assertEqual(exp_results, results)
+
+    def _write_tapes(self):
+        tapedir = self.make_directory()
+        tapes = []
+        for i in range(3):
+            blocks = [create_tap_header_block(start=32768 + i), create_tap_data_block([i + 1])]
+            tapes.append(self.write_bin_file([b for block in blocks for b in block], '{}/game{}.tap'.format(tapedir, i)))
+        self.write_text_file('Not a tape', '{}/game.txt'.format(tapedir))
+        return tapedir, tapes
+
+    def test_batch_directory(self):
+        tapedir, tapes = self._write_tapes()
+        odir = self.make_directory()
+        exp_results = []
+        for i, tape in enumerate(tapes):
+            z80 = 'game{}.z80'.format(i)
+            exp_results.append({'tape': tape, 'snapshot': z80, 'output': ['Writing {}/{}'.format(odir, z80)]})
+        self._test_batch('-d {} {}'.format(odir, tapedir), exp_results)
+        for i in range(3):
+            snapshot = get_snapshot('{}/game{}.z80'.format(odir, i))
+            self.assertEqual(snapshot[32768 + i], i + 1)
+
+    def test_batch_glob_pattern(self):
+        tapedir, tapes = self._write_tapes()
+        odir = self.make_directory()
+        exp_results = [{'tape': tapes[1], 'snapshot': 'game1.z80', 'output': ['Writing {}/game1.z80'.format(odir)]}]
+        self._test_batch('-d {} {}/game1*'.format(odir, tapedir), exp_results)
+
+    def test_option_manifest(self):
+        tapedir, tapes = self._write_tapes()
+        odir = self.make_directory()
+        manifest = self.write_text_file(textwrap.dedent("""
+            ; Tapes to convert
+            {} first.z80 --ram poke=40000,1 --reg pc=40000 # Comment
+
+            {} --start 30000
+            {}/nonexistent.tap
+        """).format(tapes[0], tapes[2], tapedir))
+        exp_results = [
+            {'tape': tapes[0], 'snapshot': 'first.z80', 'output': ['Writing {}/first.z80'.format(odir)]},
+            {'tape': tapes[2], 'snapshot': 'game2.z80', 'output': ['Writing {}/game2.z80'.format(odir)]},
+            {'tape': '{}/nonexistent.tap'.format(tapedir), 'snapshot': 'nonexistent.z80', 'output': [],
+             'error': 'Error while getting snapshot nonexistent.z80: {}/nonexistent.tap: file not found'.format(tapedir)}
+        ]
+        self._test_batch('-d {} --ram poke=40001,7 --manifest {}'.format(odir, manifest), exp_results)
+        snapshot = get_snapshot('{}/first.z80'.format(odir))
+        self.assertEqual([1, 7], snapshot[40000:40002])
+        for z80, pc in (('first.z80', 40000), ('game2.z80', 30000)):
+            with open('{}/{}'.format(odir, z80), 'rb') as f:
+                z80_header = f.read(34)
+            self.assertEqual(z80_header[32] + 256 * z80_header[33], pc)
+
+    def test_option_manifest_with_invalid_line(self):
+        manifest = self.write_text_file('in.tap out.z80 extra.z80')
+        with self.assertRaisesRegex(SkoolKitError, '^Invalid line in manifest {}: in.tap out.z80 extra.z80$'.format(manifest)):
+            self.run_tap2sna('--manifest {}'.format(manifest))
+
+    def test_option_manifest_with_jobs_or_manifest_option(self):
+        for option in ('--jobs 2', '--manifest other.txt'):
+            manifest = self.write_text_file('in.tap {}'.format(option))
+            with self.assertRaisesRegex(SkoolKitError, '^--jobs and --manifest cannot be used in manifest {}: in.tap {}$'.format(manifest, option)):
+                self.run_tap2sna('--manifest {}'.format(manifest))
+
+    def test_option_manifest_with_clashing_snapshots(self):
+        tapedir, tapes = self._write_tapes()
+        odir = self.make_directory()
+        manifest = self.write_text_file('{}\n{} game0.z80'.format(tapes[0], tapes[1]))
+        with self.assertRaisesRegex(SkoolKitError, '^{} and {} would both be written to {}/game0.z80$'.format(tapes[0], tapes[1], odir)):
+            self.run_tap2sna('-d {} --manifest {}'.format(odir, manifest))
+        self.assertEqual(os.listdir(odir), [])
+
+    def test_batch_with_clashing_snapshots(self):
+        topdir = self.make_directory()
+        tapes = []
+        for subdir in ('a', 'b'):
+            blocks = [create_tap_header_block(start=32768), create_tap_data_block([1])]
+            tapes.append(self.write_bin_file([b for block in blocks for b in block], '{}/{}/game.tap'.format(topdir, subdir)))
+        odir = self.make_directory()
+        with self.assertRaisesRegex(SkoolKitError, '^{} and {} would both be written to {}/game.z80$'.format(tapes[0], tapes[1], odir)):
+            self.run_tap2sna('--jobs 2 -d {} {}/*/game.tap'.format(odir, topdir))
+        self.assertEqual(os.listdir(odir), [])
+
+    def test_option_jobs(self):
+        tapedir, tapes = self._write_tapes()
+        output, error = self.run_tap2sna('-d {} {}'.format(self.make_directory(), tapedir))
+        self.assertEqual(error, '')
+        exp_results = [json.loads(line) for line in output.split('\n')[:-1]]
+        for jobs in (2, 3):
+            odir = self.make_directory()
+            for result in exp_results:
+                result.pop('time', None)
+                result['output'] = ['Writing {}/{}'.format(odir, result['snapshot'])]
+            self._test_batch('--jobs {} -d {} {}'.format(jobs, odir, tapedir), exp_results)
+
     def test_option_V(self):
         for option in ('-V', '--version'):
             output, error = self.run_tap2sna(option, catch_exit=0)
@@ -314,6 +418,14 @@ class Tap2SnaTest(SkoolKitTestCase):
         snapshot = self._get_snapshot(start, data, load_options='--ram load=1,{},,,{}'.format(start, offset))
         self.assertEqual(data, snapshot[start + offset:start + offset + len(data)])
 
+    def test_ram_load_with_offset_wraparound(self):
+        start = 16384
+        data = [1, 2, 3, 4]
+        offset = 49150
+        snapshot = self._get_snapshot(start, data, load_options='--ram load=1,{},,,{}'.format(start, offset))
+        self.assertEqual(data[:2], snapshot[65534:])
+        self.assertEqual([0, 0], snapshot[16384:16386])
+
     def test_ram_load_with_increment(self):
         start = 65534
         data = [8, 9, 10]
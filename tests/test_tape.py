@@ -0,0 +1,62 @@
+from skoolkittest import SkoolKitTestCase, create_tap_data_block, create_tzx_data_block
+from skoolkit.tape import TapeBlocks, TapeError
+
+def _tzx(*blocks):
+    tzx = bytearray(b'ZXTape!\x1a\x01\x14')
+    for block in blocks:
+        tzx.extend(block)
+    return tzx
+
+class TapeBlocksTest(SkoolKitTestCase):
+    def test_tap(self):
+        tap = bytearray(create_tap_data_block([1, 2]) + create_tap_data_block([3]))
+        blocks = TapeBlocks(tap)
+        self.assertEqual(len(blocks), 2)
+        self.assertEqual([list(b) for b in blocks], [[255, 1, 2, 3], [255, 3, 3]])
+        self.assertEqual(list(blocks[-1]), [255, 3, 3])
+        self.assertIsInstance(blocks[0], memoryview)
+
+    def test_tzx(self):
+        tzx = _tzx(
+            create_tzx_data_block([1, 2]),
+            (32, 0, 0),             # Pause
+            (48, 2, 65, 66),        # Text description
+            create_tzx_data_block([3])
+        )
+        blocks = TapeBlocks(tzx, True)
+        self.assertEqual(len(blocks), 4)
+        self.assertEqual(list(blocks[0]), [255, 1, 2, 3])
+        self.assertIsNone(blocks[1])
+        self.assertIsNone(blocks[2])
+        self.assertEqual(list(blocks[3]), [255, 3, 3])
+        exp_blocks = [(16, 10), (32, 19), (48, 22), (16, 26)]
+        self.assertEqual([(b[0], b[1]) for b in blocks.blocks()], exp_blocks)
+
+    def test_blocks_are_indexed_only_as_far_as_needed(self):
+        tzx = _tzx(
+            create_tzx_data_block([1]),
+            create_tzx_data_block([2]),
+            (26, 0) # Unknown block ID
+        )
+        blocks = TapeBlocks(tzx, True)
+        self.assertEqual(list(blocks[1]), [255, 2, 2])
+        self.assertEqual(len(blocks.index), 2)
+        with self.assertRaises(TapeError) as cm:
+            len(blocks)
+        self.assertEqual(cm.exception.args[0], 'Unknown TZX block ID: 0x1A')
+
+    def test_block_not_found(self):
+        blocks = TapeBlocks(bytearray(create_tap_data_block([1])))
+        with self.assertRaises(IndexError):
+            blocks[1]
+
+    def test_data_is_not_copied(self):
+        tap = bytearray(create_tap_data_block([1, 2, 3]))
+        block = TapeBlocks(tap)[0]
+        tap[3] = 4
+        self.assertEqual(block[1], 4)
+
+    def test_not_a_tzx_file(self):
+        with self.assertRaises(TapeError) as cm:
+            TapeBlocks(bytearray(b'ZXTape?\x1a\x01\x14'), True)
+        self.assertEqual(cm.exception.args[0], 'Not a TZX file')
@@ -145,6 +145,14 @@ class TapinfoTest(SkoolKitTestCase):
             self.run_tapinfo(tzxfile)
         self.assertEqual(cm.exception.args[0], 'Unknown block ID: 0x{:02X}'.format(block_id))
 
+    def test_tzx_with_unknown_block_after_known_block(self):
+        block_id = 26
+        tzxfile = self._write_tzx([TZX_DATA_BLOCK, [block_id, 0]])
+        with self.assertRaises(SkoolKitError) as cm:
+            self.run_tapinfo(tzxfile)
+        self.assertEqual(cm.exception.args[0], 'Unknown block ID: 0x{:02X}'.format(block_id))
+        self.assertEqual(self.out.getvalue(), 'Version: 1.20' + TZX_DATA_BLOCK_DESC.format(1))
+
     def test_tzx_block_0x11(self):
         data = [0, 1, 2]
         block = [17] # Block ID